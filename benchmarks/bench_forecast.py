@@ -0,0 +1,187 @@
+# ==========================
+# Benchmark suite: synthetic ECMWF-style grids at scale
+#
+#   python benchmarks/bench_forecast.py                               # default matrix
+#   python benchmarks/bench_forecast.py --cells 98,1000000 --leads 16 --files 4
+#   python benchmarks/bench_forecast.py --compare bench_results/<old>.json bench_results/<new>.json
+#
+# Each case writes CSVs in the exporter layout (longitude,latitude,forecast_date,param,param_tag,<N>h...),
+# then times cold/warm load_forecast, scalar and batch interpolation, the radius query and the alert
+# banner. Results go to bench_results/<commit>.json so runs can be compared across commits.
+# ==========================
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bhutan_weather import (bilinear_interpolation, compute_rainfall_alerts, find_surrounding_points,  # noqa: E402
+                            interpolate_points, load_alert_config, load_forecast, points_within_radius)
+
+PARAMS = [("temperature_celcius", "t2m_cel"), ("precipitation", "tp"), ("surface_area", "sro")]
+RUN_ID = "20250914000000"
+GRID_STEP = 0.25
+CENTER_LAT, CENTER_LON = 27.25, 90.25  # keep Bhutan inside every synthetic grid
+
+def grid_axes(n_cells):
+    # Near-square grid of at least n_cells at 0.25 deg (98 -> the real 7x14), tightened for very large grids
+    root = int(np.sqrt(n_cells))
+    n_lat = next((d for d in range(root, max(2, root // 2) - 1, -1) if n_cells % d == 0), root)
+    n_lat = max(2, n_lat)
+    n_lon = max(2, int(np.ceil(n_cells / n_lat)))
+    lat_step = min(GRID_STEP, 30 / n_lat)
+    lon_step = min(GRID_STEP, 30 / n_lon)
+    latitudes = CENTER_LAT + (np.arange(n_lat) - n_lat // 2) * lat_step
+    longitudes = CENTER_LON + (np.arange(n_lon) - n_lon // 2) * lon_step
+    return np.round(latitudes, 6), np.round(longitudes, 6)
+
+def write_synthetic_csvs(directory, n_cells, n_leads, n_files, seed=0):
+    rng = np.random.default_rng(seed)
+    latitudes, longitudes = grid_axes(n_cells)
+    lat_grid, lon_grid = np.meshgrid(latitudes, longitudes, indexing='ij')
+    lead_hours = 6 * np.arange(1, n_leads + 1)
+    keys = pd.DataFrame({
+        'longitude': np.tile(lon_grid.ravel(), len(PARAMS)),
+        'latitude': np.tile(lat_grid.ravel(), len(PARAMS)),
+        'forecast_date': "2025-09-14",
+        'param': np.repeat([p for p, _ in PARAMS], lat_grid.size),
+        'param_tag': np.repeat([t for _, t in PARAMS], lat_grid.size),
+    })
+
+    # Lead columns are split across files the way the exporter chunks them
+    for k, leads in enumerate(np.array_split(lead_hours, n_files), start=1):
+        values = rng.gamma(0.5, 0.05, size=(len(keys), len(leads))).astype(np.float32)
+        chunk = pd.concat([keys, pd.DataFrame(values, columns=[f"{h}h" for h in leads])], axis=1)
+        chunk.to_csv(os.path.join(directory, f"ecmwf_data_{RUN_ID}_bench_oper_fc_{k}.csv"), index=False)
+    return lat_grid.size
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': float(np.median(times))}
+
+def run_case(n_cells, n_leads, n_files, repeat, n_points, alert_config):
+    workdir = tempfile.mkdtemp(prefix="bench_forecast_")
+    csv_dir = os.path.join(workdir, "csv")
+    store_dir = os.path.join(workdir, "store")
+    os.makedirs(csv_dir)
+    try:
+        actual_cells = write_synthetic_csvs(csv_dir, n_cells, n_leads, n_files)
+        result = {'cells': actual_cells, 'leads': n_leads, 'files': n_files, 'timings': {}}
+        timings = result['timings']
+
+        # Cold load parses the CSVs and writes the store; warm load only maps it
+        def cold_load():
+            shutil.rmtree(store_dir, ignore_errors=True)
+            load_forecast(csv_dir, store_dir, alert_config)
+        timings['load_cold'] = timed(cold_load, repeat)
+        timings['load_warm'] = timed(lambda: load_forecast(csv_dir, store_dir, alert_config), repeat)
+        cube = load_forecast(csv_dir, store_dir, alert_config)
+
+        rng = np.random.default_rng(1)
+        lats = rng.uniform(cube['latitudes'][0], cube['latitudes'][-1], n_points)
+        lons = rng.uniform(cube['longitudes'][0], cube['longitudes'][-1], n_points)
+
+        # Scalar path: one corner lookup and interpolation per point and lead
+        def scalar():
+            for lat, lon in zip(lats[:100], lons[:100]):
+                for time_col in cube['time_cols']:
+                    data = find_surrounding_points(cube, lat, lon, "precipitation", time_col)
+                    if data:
+                        bilinear_interpolation(data, lat, lon)
+        t = timed(scalar, repeat)
+        timings['interp_scalar_per_point_all_leads'] = {k: v / 100 for k, v in t.items()}
+
+        t = timed(lambda: interpolate_points(cube, lats, lons), repeat)
+        timings['interp_batch_per_point_all_params'] = {k: v / n_points for k, v in t.items()}
+
+        def radius():
+            for lat, lon in zip(lats[:100], lons[:100]):
+                points_within_radius(cube, lat, lon, radius_km=10)
+        t = timed(radius, repeat)
+        timings['radius_query'] = {k: v / 100 for k, v in t.items()}
+
+        config = load_alert_config(alert_config)
+        timings['alert_banner'] = timed(lambda: compute_rainfall_alerts(cube, config), repeat)
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(old_path, new_path):
+    # Print new/old median ratios for the cases both files share
+    with open(old_path) as f:
+        old = {(r['cells'], r['leads'], r['files']): r['timings'] for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = json.load(f)['results']
+    for r in new:
+        key = (r['cells'], r['leads'], r['files'])
+        if key not in old:
+            continue
+        print(f"cells={key[0]} leads={key[1]} files={key[2]}")
+        for name, t in r['timings'].items():
+            if name in old[key]:
+                ratio = t['median'] / old[key][name]['median']
+                print(f"  {name:40s} {old[key][name]['median']:.6f}s -> {t['median']:.6f}s  x{ratio:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark forecast ingestion, interpolation and alerts")
+    parser.add_argument("--cells", default="98,10000,100000", help="comma-separated grid sizes (cells per param)")
+    parser.add_argument("--leads", default="16,64", help="comma-separated lead column counts")
+    parser.add_argument("--files", default="4", help="comma-separated CSV file counts")
+    parser.add_argument("--points", type=int, default=1000, help="points per batch interpolation")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--alert-config", default="alert_config.json")
+    parser.add_argument("--output", help="results file (default bench_results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': pd.Timestamp.now(tz="UTC").isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': [],
+    }
+    for n_cells in map(int, args.cells.split(",")):
+        for n_leads in map(int, args.leads.split(",")):
+            for n_files in map(int, args.files.split(",")):
+                result = run_case(n_cells, n_leads, min(n_files, n_leads), args.repeat, args.points,
+                                  args.alert_config)
+                report['results'].append(result)
+                print(f"cells={result['cells']} leads={n_leads} files={result['files']}")
+                for name, t in result['timings'].items():
+                    print(f"  {name:40s} {t['median']:.6f}s")
+
+    output = args.output or os.path.join("bench_results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+# Headless forecast library used by the Streamlit app (app.py) and the JSON endpoint (server.py)
+from .aggregates import compute_daily_aggregates, daily_points, interpolate_times, valid_times
+from .alerts import compute_rainfall_alerts, high_rainfall_alert, load_alert_config, rainfall_level
+from .data import group_forecast_csvs, lead_hour, load_forecast, prune_forecast_store
+from .exceedance import compute_exceedance_regions, label_regions, window_totals
+from .geo import cells_within_radius, haversine_km, points_within_radius
+from .geocode import geocode_location
+from .interpolation import bilinear_interpolation, clean_value, find_surrounding_points, interpolate_points
+from .overlays import forecast_overlays, render_overlays
+from .places import nearby_places
+from .runs import ForecastRuns
+from .series import clear_series_cache, location_series
+from .zones import load_zonal_statistics, overlap_weights, zonal_statistics
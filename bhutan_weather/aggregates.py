@@ -0,0 +1,126 @@
+# ==========================
+# Daily aggregates by calendar day of valid time, and values at arbitrary valid times
+# ==========================
+import numpy as np
+import pandas as pd
+
+from .interpolation import interpolate_points
+
+# Amounts are totalled over the day; temperature is summarised
+DAILY_STATS = {
+    "precipitation": ["total"],
+    "surface_area": ["total"],
+    "temperature_celcius": ["min", "max", "mean"],
+}
+# ECMWF accumulates precipitation (tp) and runoff (sro) from the start of the run: each lead
+# holds the amount since 0h, not since the previous lead
+ACCUMULATED_PARAMS = {"precipitation", "surface_area"}
+DAILY_FORMAT = 2  # bumped when stored day summaries must be recomputed (2: accumulated params de-accumulated)
+DAILY_BLOCK_CELLS = 1 << 16  # grid cells per block when computing the day summaries
+
+def valid_times(cube):
+    return cube['forecast_date'] + pd.to_timedelta(cube['lead_hours'], unit='h')
+
+def deaccumulate(x):
+    # Per-lead amounts from a run-accumulated series (last axis = leads): the first lead as is,
+    # then the rise since the previous reported lead. A missing lead stays NaN and the next one
+    # carries the whole gap; a drop (inconsistent chunks) counts as no rain, never as negative.
+    # float32 input stays float32.
+    x = np.asarray(x)
+    if x.dtype != np.float32:
+        x = x.astype(np.float64)
+    valid = ~np.isnan(x)
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(x.shape[-1], dtype=np.int32), -1), axis=-1)
+    previous = np.concatenate([np.full(x.shape[:-1] + (1,), -1, dtype=np.int32), last_valid[..., :-1]], axis=-1)
+    before = np.where(previous >= 0, np.take_along_axis(x, np.maximum(previous, 0), axis=-1), 0)
+    return np.where(valid, np.maximum(x - before, 0), np.nan)
+
+def run_totals(x):
+    # Amount accumulated by the end of the run (last axis = leads) as the sum of the per-lead
+    # rises, so a missing lead or a drop between chunks counts as in deaccumulate; 0 without data
+    return np.nansum(deaccumulate(x), axis=-1)
+
+def reduce_days(x, starts, stat):
+    # Reduce the last (lead) axis over the day blocks beginning at starts; NaN leads are skipped
+    valid = ~np.isnan(x)
+    counts = np.add.reduceat(valid, starts, axis=-1, dtype=np.intp)
+    if stat in ("total", "mean"):
+        total = np.add.reduceat(np.where(valid, x, 0), starts, axis=-1, dtype=np.float64)
+        result = total if stat == "total" else total / np.maximum(counts, 1)
+    elif stat == "min":
+        result = np.fmin.reduceat(x, starts, axis=-1)
+    else:
+        result = np.fmax.reduceat(x, starts, axis=-1)
+    return np.where(counts > 0, result, np.nan).astype(np.float32)
+
+def daily_layout(cube):
+    # Field names ("<param>_<stat>"), the index of each day's first lead and the days
+    days = valid_times(cube).normalize()
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])  # leads are sorted by hour
+    names = [f"{param}_{stat}" for param, stats in DAILY_STATS.items() if param in cube['param_index']
+             for stat in stats]
+    return names, starts, list(days[starts])
+
+def fill_daily_values(cube, starts, out, block_cells=DAILY_BLOCK_CELLS):
+    # Writes the day summaries into out (field x latitude x longitude x day) a block of latitudes
+    # at a time, so only one float32 block of a param is ever held, however large the grid
+    rows = max(1, block_cells // max(len(cube['longitudes']), 1))
+    for lat_start in range(0, len(cube['latitudes']), rows):
+        block = slice(lat_start, lat_start + rows)
+        field = 0
+        for param, stats in DAILY_STATS.items():
+            if param not in cube['param_index']:
+                continue
+            x = np.asarray(cube['values'][cube['param_index'][param], block], dtype=np.float32)
+            if param in ACCUMULATED_PARAMS:
+                x = deaccumulate(x)  # a day's total is what fell during it, not a sum of running totals
+            for stat in stats:
+                out[field, block] = reduce_days(x, starts, stat)
+                field += 1
+
+def daily_grid(cube, names, days, lead_counts, values):
+    # Cube-shaped dict of day summaries, so interpolate_points reads them like any other field
+    return {
+        'params': names,
+        'param_index': {name: i for i, name in enumerate(names)},
+        'latitudes': cube['latitudes'],
+        'longitudes': cube['longitudes'],
+        'days': days,
+        'lead_counts': np.asarray(lead_counts),
+        'values': values,
+    }
+
+def compute_daily_aggregates(cube):
+    # Day summaries in memory; runs with a forecast store map them from there instead
+    # (see data.load_daily_aggregates)
+    names, starts, days = daily_layout(cube)
+    values = np.empty((len(names), len(cube['latitudes']), len(cube['longitudes']), len(starts)),
+                      dtype=np.float32)
+    fill_daily_values(cube, starts, values)
+    values.flags.writeable = False
+    return daily_grid(cube, names, days, np.diff(np.r_[starts, len(cube['time_cols'])]), values)
+
+def daily_points(cube, lats, lons, names=None):
+    # Day summaries at arbitrary points: (n_points x n_stats x n_days)
+    return interpolate_points(cube['daily'], lats, lons, names)
+
+def interpolate_times(cube, lats, lons, times, params=None):
+    # Values at arbitrary valid times, linear between the bracketing leads:
+    # (n_points x n_params x n_times), NaN outside the forecast range
+    series = interpolate_points(cube, lats, lons, params)
+    lead_hours = cube['lead_hours'].astype(float)
+    hours = (pd.DatetimeIndex(np.atleast_1d(times)) - cube['forecast_date']) / pd.Timedelta(hours=1)
+    hours = np.asarray(hours, dtype=float)
+
+    right = np.clip(np.searchsorted(lead_hours, hours, side='left'), 0, len(lead_hours) - 1)
+    left = np.maximum(right - 1, 0)
+    span = lead_hours[right] - lead_hours[left]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(span > 0, (hours - lead_hours[left]) / span, 0.0)
+        blend = series[..., left] * (1 - frac) + series[..., right] * frac
+    # A time on a lead takes that lead's value even when its neighbour is missing
+    result = np.where(frac >= 1, series[..., right], np.where(frac <= 0, series[..., left], blend))
+
+    outside = (hours < lead_hours[0]) | (hours > lead_hours[-1])
+    result[..., outside] = np.nan
+    return result
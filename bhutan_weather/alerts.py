@@ -0,0 +1,86 @@
+# ==========================
+# Rainfall alerts: the Live Rainfall Alert table and the radius alert
+# ==========================
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .aggregates import run_totals
+from .geo import points_within_radius
+from .interpolation import interpolate_points
+
+ALERTS_FORMAT = 2  # bumped whenever compute_rainfall_alerts changes, so stored alerts.json files are recomputed
+
+def load_alert_config(path="alert_config.json"):
+    # Alert locations and the rainfall threshold ladder (highest level first)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def rainfall_level(total_precip, levels):
+    # Highest level the total reaches; None at or below the lowest (moderate) level
+    if total_precip <= levels[-1]['min_mm']:
+        return None
+    return next(l for l in levels if total_precip >= l['min_mm'])
+
+def compute_rainfall_alerts(cube, config):
+    if "precipitation" not in cube['param_index']:
+        return None
+    locations = config['locations']
+
+    # Rain over the whole run at each location: the accumulated total at the end of the run per
+    # cell (run_totals, the regional alerts' "Full run" window), interpolated to every location
+    # in one pass. Outside the grid counts as no rain.
+    totals = run_totals(cube['values'][cube['param_index']['precipitation']])
+    grid = {'params': ["precipitation"], 'param_index': {"precipitation": 0}, 'latitudes': cube['latitudes'],
+            'longitudes': cube['longitudes'], 'values': totals[None, :, :, None]}
+    place_totals = np.nan_to_num(interpolate_points(grid, [p['lat'] for p in locations],
+                                                    [p['lon'] for p in locations])[:, 0, 0])
+
+    heavy_rain_places = []
+    for place, total_precip in zip(locations, place_totals):
+        level = rainfall_level(total_precip, config['levels'])
+        if level is None:
+            continue
+        heavy_rain_places.append({
+            'name': place['name'],
+            'precip': round(float(total_precip), 2),
+            'alert_level': level['label'],
+            'color': level['color']
+        })
+
+    # Sort by precipitation and limit to the configured number of places
+    return sorted(heavy_rain_places, key=lambda x: x['precip'], reverse=True)[:config['max_places']]
+
+def load_run_product(path, cube, config, compute, version):
+    # A per-run result stored next to the run's arrays, recomputed when the run, the alert
+    # config or the product's version (bumped whenever compute changes) differs
+    config_hash = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+    try:
+        with open(path, encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get('format') == version and stored['config'] == config_hash and stored['source'] == cube['source']:
+            return stored['result']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    result = compute(cube, config)
+    try:
+        with open(path + f".{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+            json.dump({'format': version, 'config': config_hash, 'source': cube['source'], 'result': result}, f)
+        os.replace(path + f".{os.getpid()}.tmp", path)
+    except OSError:
+        pass
+    return result
+
+def load_rainfall_alerts(cube, run_dir, config):
+    return load_run_product(os.path.join(run_dir, "alerts.json"), cube, config, compute_rainfall_alerts,
+                            ALERTS_FORMAT)
+
+def high_rainfall_alert(cube, lat, lon, radius_km=10, threshold_mm=0.01):
+    # True when precipitation summed over the cells within radius_km exceeds the threshold at any lead
+    if "precipitation" not in cube['param_index']:
+        return False
+    totals = points_within_radius(cube, lat, lon, radius_km=radius_km)
+    return bool(np.any(totals[cube['param_index']['precipitation']] > threshold_mm))
@@ -0,0 +1,142 @@
+# ==========================
+# Batch point forecasts for every place in a gazetteer, e.g. a nightly bulletin for all gewogs
+#   python -m bhutan_weather.batch --gazetteer gazetteer.csv --output bulletin.csv [--daily] [--workers 4]
+# The gazetteer is the geocoder's format (locality,gewog_thromde,dzongkhag,lat,lon). Chunks are
+# interpolated on a process pool; every worker maps the same run store, so the grid is not copied.
+# Rows are streamed to CSV, or to Parquet when pyarrow is installed.
+# ==========================
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .data import load_daily_aggregates, load_forecast
+from .geocode import GAZETTEER_PATH
+from .interpolation import interpolate_points
+
+FORECAST_DIR = os.getenv("FORECAST_DIR", "csv_files")
+FORECAST_STORE_DIR = os.getenv("FORECAST_STORE_DIR", "forecast_store")
+PLACE_COLS = ['locality', 'gewog_thromde', 'dzongkhag', 'lat', 'lon']
+
+_worker_cube = None
+
+def load_batch_cube(directory, store_dir, run_id, daily):
+    # Only the grid (and the day summaries when asked for); alerts and zones are not needed here
+    cube = load_forecast(directory, store_dir, run_id=run_id, derived=False)
+    if cube is not None and daily:
+        cube['daily'] = load_daily_aggregates(cube, store_dir)
+    return cube
+
+def init_worker(directory, store_dir, run_id, daily, cube=None):
+    # In-process runs hand over the cube already loaded instead of loading the run again
+    global _worker_cube
+    _worker_cube = cube if cube is not None else load_batch_cube(directory, store_dir, run_id, daily)
+
+def interpolate_chunk(lats, lons, daily):
+    grid = _worker_cube['daily'] if daily else _worker_cube
+    return interpolate_points(grid, lats, lons).astype(np.float32)
+
+def chunk_frame(cube, places, values, daily):
+    # One row per place and param (or daily stat), with a column per lead (or day)
+    grid = cube['daily'] if daily else cube
+    columns = [d.strftime("%Y-%m-%d") for d in grid['days']] if daily else list(cube['time_cols'])
+    n, n_params, _ = values.shape
+    frame = places.loc[places.index.repeat(n_params), PLACE_COLS].reset_index(drop=True)
+    frame.insert(0, 'run_id', cube['run_id'])
+    frame['param'] = np.tile(grid['params'], n)
+    return pd.concat([frame, pd.DataFrame(values.reshape(n * n_params, -1), columns=columns)], axis=1)
+
+class ParquetSink:
+    # Appends each chunk as a row group; needs pyarrow
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow; use a .csv output instead")
+        self._pa, self._pq, self._path, self._writer = pa, pq, path, None
+
+    def write(self, frame):
+        table = self._pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+class CsvSink:
+    def __init__(self, path):
+        self._path, self._header = path, True
+
+    def write(self, frame):
+        frame.to_csv(self._path, mode="w" if self._header else "a", header=self._header, index=False,
+                     float_format="%.4f")
+        self._header = False
+
+    def close(self):
+        pass
+
+def run_batch(gazetteer, output, directory=FORECAST_DIR, store_dir=FORECAST_STORE_DIR, run_id=None,
+              daily=False, workers=None, chunk_size=500):
+    # Returns a summary dict; places without coordinates are skipped and counted
+    started = time.perf_counter()
+    cube = load_batch_cube(directory, store_dir, run_id, daily)
+    if cube is None:
+        raise SystemExit(f"No forecast run found in {directory}")
+
+    places = pd.read_csv(gazetteer)
+    places['lat'] = pd.to_numeric(places['lat'], errors='coerce')
+    places['lon'] = pd.to_numeric(places['lon'], errors='coerce')
+    skipped = int(places[['lat', 'lon']].isna().any(axis=1).sum())
+    places = places.dropna(subset=['lat', 'lon']).reset_index(drop=True)
+    chunks = [places.iloc[i:i + chunk_size] for i in range(0, len(places), chunk_size)]
+
+    sink = ParquetSink(output) if output.endswith(".parquet") else CsvSink(output)
+    try:
+        if workers == 0 or len(chunks) <= 1:
+            # Small jobs are faster in-process than paying for pool start-up
+            init_worker(directory, store_dir, cube['run_id'], daily, cube)
+            results = (interpolate_chunk(c['lat'].values, c['lon'].values, daily) for c in chunks)
+            for chunk, values in zip(chunks, results):
+                sink.write(chunk_frame(cube, chunk, values, daily))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(directory, store_dir, cube['run_id'], daily)) as pool:
+                # map() yields in order as chunks finish, so rows stream out while others compute
+                results = pool.map(interpolate_chunk, [c['lat'].values for c in chunks],
+                                   [c['lon'].values for c in chunks], [daily] * len(chunks))
+                for chunk, values in zip(chunks, results):
+                    sink.write(chunk_frame(cube, chunk, values, daily))
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - started
+    return {'run_id': cube['run_id'], 'places': len(places), 'skipped': skipped, 'seconds': elapsed,
+            'places_per_second': len(places) / elapsed if elapsed > 0 else float('inf'), 'output': output}
+
+def main():
+    parser = argparse.ArgumentParser(description="Point forecasts for every place in a gazetteer")
+    parser.add_argument("--gazetteer", default=GAZETTEER_PATH, help="CSV with locality,gewog_thromde,dzongkhag,lat,lon")
+    parser.add_argument("--output", required=True, help="output .csv or .parquet")
+    parser.add_argument("--forecast-dir", default=FORECAST_DIR)
+    parser.add_argument("--store-dir", default=FORECAST_STORE_DIR)
+    parser.add_argument("--run-id", help="model cycle to use (default: latest complete run)")
+    parser.add_argument("--daily", action="store_true", help="day summaries instead of every lead")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count, 0 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="places per task")
+    args = parser.parse_args()
+
+    summary = run_batch(args.gazetteer, args.output, args.forecast_dir, args.store_dir, args.run_id,
+                        args.daily, args.workers, args.chunk_size)
+    print(f"Run {summary['run_id']}: {summary['places']} places in {summary['seconds']:.2f}s "
+          f"({summary['places_per_second']:.0f} places/s), {summary['skipped']} skipped -> {summary['output']}",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
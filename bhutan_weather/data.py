@@ -0,0 +1,420 @@
+# ==========================
+# Forecast ingestion and the on-disk forecast store
+# ==========================
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .aggregates import DAILY_FORMAT, compute_daily_aggregates, daily_grid, daily_layout, fill_daily_values
+from .alerts import load_alert_config, load_rainfall_alerts
+from .exceedance import load_exceedance_regions
+from .zones import load_zonal_statistics
+
+KEY_COLS = ['longitude', 'latitude', 'forecast_date', 'param']
+RUN_SETTLE_SECONDS = int(os.getenv("FORECAST_SETTLE_SECONDS", "60"))  # a run is complete once its files stop changing
+STORE_FORMAT = 2  # bumped when stored runs must be rebuilt (2: ISO forecast dates are no longer read day-first)
+
+# ==========================
+# Load CSVs from a specific directory (_1, _2, ...) and join forecast columns on the grid keys.
+# Files are streamed in chunks straight into the preallocated cube, so no whole file or merged
+# frame is ever held: peak memory is a few chunks plus the (memory-mapped) output array.
+# ==========================
+# Parse straight into the compact types: float32 leads, coordinates at full precision, params as
+# categories; param_tag is never used, so it is not read
+CSV_DTYPES = defaultdict(lambda: np.float32, longitude=np.float64, latitude=np.float64, forecast_date=str,
+                         param='category')
+CSV_CHUNK_ROWS = int(os.getenv("FORECAST_CHUNK_ROWS", "50000"))
+
+def parse_bbox(text):
+    # "south,west,north,east" in degrees, e.g. FORECAST_BBOX=26.5,88.5,28.5,92.5
+    return tuple(float(v) for v in text.split(",")) if text else None
+
+# Optional ingest filter: only cells inside the box and only the listed params are loaded
+INGEST_BBOX = parse_bbox(os.getenv("FORECAST_BBOX"))
+INGEST_PARAMS = [p.strip() for p in os.getenv("FORECAST_PARAMS", "").split(",") if p.strip()] or None
+
+def list_forecast_csvs(directory):
+    # Sort CSVs by numeric suffix (e.g., _1, _2, _3)
+    def get_suffix_num(filename):
+        match = re.search(r'_(\d+)\.csv$', filename)
+        return int(match.group(1)) if match else 0
+
+    return sorted([f for f in os.listdir(directory) if f.endswith(".csv")], key=get_suffix_num)
+
+def read_csv_chunks(path, columns):
+    return pd.read_csv(path, usecols=columns, dtype={c: CSV_DTYPES[c] for c in columns}, chunksize=CSV_CHUNK_ROWS)
+
+def filter_chunk(chunk, bbox, params):
+    keep = chunk['latitude'].notna() & chunk['longitude'].notna() & chunk['param'].notna()
+    if bbox is not None:
+        south, west, north, east = bbox
+        keep &= chunk['latitude'].between(south, north) & chunk['longitude'].between(west, east)
+    if params is not None:
+        keep &= chunk['param'].isin(params)
+    return chunk[keep]
+
+def parse_forecast_date(text):
+    # Exporters write 2025-09-14 or 14-09-2025; only the second form is day-first, so ISO dates
+    # are never read with day and month swapped. ValueError on anything else.
+    text = str(text).strip()
+    if re.fullmatch(r'\d{1,2}-\d{1,2}-\d{4}', text):
+        return pd.to_datetime(text, format='%d-%m-%Y')
+    return pd.to_datetime(text, format='ISO8601')
+
+def scan_forecast_csvs(directory, csv_files, bbox=None, params=None):
+    # Pass 1 reads only the key columns: grid axes, params in order of appearance, the lead
+    # columns each file contributes (a lead already seen in an earlier chunk is not read twice)
+    # and the run date
+    def scan(file):
+        path = os.path.join(directory, file)
+        header = list(pd.read_csv(path, nrows=0).columns)
+        lats, lons, names, dates = [], [], {}, set()
+        for chunk in read_csv_chunks(path, [c for c in KEY_COLS if c in header]):
+            chunk = filter_chunk(chunk, bbox, params)
+            lats.append(np.unique(chunk['latitude'].values))
+            lons.append(np.unique(chunk['longitude'].values))
+            names.update(dict.fromkeys(chunk['param'].unique()))
+            if 'forecast_date' in chunk.columns:
+                dates.update(chunk['forecast_date'].dropna().unique())
+        return header, lats, lons, names, dates
+
+    with ThreadPoolExecutor(max_workers=min(8, len(csv_files))) as pool:
+        scans = list(pool.map(scan, csv_files))
+
+    lead_cols, names, dates = {}, {}, set()
+    for file, (header, _, _, file_names, file_dates) in zip(csv_files, scans):
+        for c in header:
+            if c not in KEY_COLS and c != 'param_tag':
+                lead_cols.setdefault(c, file)
+        names.update(file_names)
+        dates.update(file_dates)
+
+    # Cells are keyed on param, latitude and longitude only, so a run must have one forecast date;
+    # rows of different dates would otherwise overwrite each other
+    try:
+        parsed = {parse_forecast_date(d) for d in dates}
+    except ValueError as e:
+        raise ValueError(f"Unreadable forecast_date in {', '.join(csv_files)}: {e}") from None
+    if len(parsed) > 1:
+        raise ValueError("Forecast files of one run mix forecast dates: " +
+                         ", ".join(sorted(d.strftime("%Y-%m-%d") for d in parsed)))
+    forecast_date = parsed.pop() if parsed else pd.Timestamp.today().normalize()
+    time_cols = sorted([c for c in lead_cols if 'h' in c], key=lead_hour)
+    return {
+        'params': list(names),
+        'latitudes': np.unique(np.concatenate([a for s in scans for a in s[1]] or [np.empty(0)])),
+        'longitudes': np.unique(np.concatenate([a for s in scans for a in s[2]] or [np.empty(0)])),
+        'time_cols': time_cols,
+        'file_cols': {file: [c for c in time_cols if lead_cols[c] == file] for file in csv_files},
+        'forecast_date': forecast_date,
+    }
+
+def fill_forecast_values(directory, csv_files, axes, values, bbox=None, params=None):
+    # Pass 2 scatters each chunk's own lead columns into values (param x lat x lon x lead), which
+    # is preallocated and NaN-filled; returns the ingest warnings
+    n_lat, n_lon = len(axes['latitudes']), len(axes['longitudes'])
+    param_index = pd.Index(axes['params'])
+    time_index = {c: i for i, c in enumerate(axes['time_cols'])}
+    # Cells supplied by any file; each file folds its own mask in when it is done and keeps only
+    # its count, so at most one mask per streaming file is alive however many chunks the run has
+    merged = np.zeros(len(axes['params']) * n_lat * n_lon, dtype=bool)
+    merged_lock = threading.Lock()
+
+    def fill(file):
+        # Cells this file has already supplied; the first row per cell wins, as in the old merge
+        seen = np.zeros(len(axes['params']) * n_lat * n_lon, dtype=bool)
+        cols = axes['file_cols'][file]
+        for chunk in read_csv_chunks(os.path.join(directory, file), ['longitude', 'latitude', 'param'] + cols):
+            chunk = filter_chunk(chunk, bbox, params)
+            cells = (param_index.get_indexer(chunk['param']) * n_lat
+                     + np.searchsorted(axes['latitudes'], chunk['latitude'].values)) * n_lon \
+                + np.searchsorted(axes['longitudes'], chunk['longitude'].values)
+            cells, first = np.unique(cells, return_index=True)
+            new = ~seen[cells]
+            cells, rows = cells[new], first[new]
+            seen[cells] = True
+            if cols and len(rows):
+                p_idx, lat_idx, lon_idx = np.unravel_index(cells, (len(axes['params']), n_lat, n_lon))
+                values[p_idx[:, None], lat_idx[:, None], lon_idx[:, None], [time_index[c] for c in cols]] = \
+                    chunk[cols].to_numpy(dtype=np.float32)[rows]
+        with merged_lock:
+            np.logical_or(merged, seen, out=merged)
+        return int(np.count_nonzero(seen))
+
+    # Files fill disjoint lead columns, so they can stream concurrently
+    with ThreadPoolExecutor(max_workers=min(8, len(csv_files))) as pool:
+        counts = list(pool.map(fill, csv_files))
+
+    # Report chunks whose grid does not cover every cell of the merged grid
+    total = int(np.count_nonzero(merged))
+    missing = [(file, total - n) for file, n in zip(csv_files, counts) if total - n]
+    if missing:
+        return ["Forecast grids do not match; missing cells: " + ", ".join(f"{file} ({n})" for file, n in missing)]
+    return []
+
+def run_id_from_filename(filename):
+    # ecmwf_data_<YYYYmmddHHMMSS>_... names the model cycle the chunk belongs to
+    match = re.match(r'ecmwf_data_(\d{14})_', filename)
+    return match.group(1) if match else "default"
+
+def is_run_id(name):
+    # Store subdirectories that are runs, as opposed to shared data such as the zone weights
+    return name == "default" or re.fullmatch(r'\d{14}', name) is not None
+
+def run_sort_key(run_id):
+    # Cycle ids sort chronologically; files without one count as the oldest run
+    return (run_id != "default", run_id)
+
+def group_forecast_csvs(directory):
+    # {run_id: csv files in suffix order}, one entry per model cycle in directory
+    runs = {}
+    for f in list_forecast_csvs(directory):
+        runs.setdefault(run_id_from_filename(f), []).append(f)
+    return runs
+
+def run_is_settled(directory, csv_files, settle_seconds=RUN_SETTLE_SECONDS):
+    # Files still being copied in keep changing; a run is only served once they have been quiet
+    newest = max(os.stat(os.path.join(directory, f)).st_mtime for f in csv_files)
+    return time.time() - newest >= settle_seconds
+
+def run_has_marker(directory, run_id):
+    # Exporters that can should write <run_id>.done after a run's last CSV; it is the only
+    # certain sign of a complete run (see ForecastRuns.refresh for runs without one)
+    return os.path.exists(os.path.join(directory, f"{run_id}.done"))
+
+def latest_run_id(directory, runs, settle_seconds=RUN_SETTLE_SECONDS):
+    # Newest complete run: marked done, or quiet for settle_seconds. When nothing qualifies yet
+    # (first start), the newest run.
+    ordered = sorted(runs, key=run_sort_key, reverse=True)
+    settled = [r for r in ordered
+               if run_has_marker(directory, r) or run_is_settled(directory, runs[r], settle_seconds)]
+    return (settled or ordered)[0] if ordered else None
+
+def load_forecast(directory="csv_files", store_dir="forecast_store", alert_config="alert_config.json",
+                  run_id=None, derived=True):
+    # Returns the forecast cube for one model cycle in directory (the latest complete one unless
+    # run_id is given), or None when there is none. Problems that do not stop loading are
+    # collected in cube['warnings']. derived=False skips the day summaries, zones and alerts
+    # (left as None) for callers that only read the grid.
+    runs = group_forecast_csvs(directory)
+    if run_id is None:
+        run_id = latest_run_id(directory, runs)
+    if run_id not in runs:
+        return None
+    csv_files = runs[run_id]
+
+    # One store directory per model cycle, so several runs can sit side by side
+    run_dir = os.path.join(store_dir, run_id)
+
+    # Map the stored arrays when the source files are unchanged since they were written
+    source = source_fingerprint(directory, csv_files)
+    with metrics.span("forecast_store_open"):
+        cube = open_forecast_store(run_dir, source)
+    if cube is None:
+        with metrics.span("forecast_csv_scan"):
+            axes = scan_forecast_csvs(directory, csv_files, INGEST_BBOX, INGEST_PARAMS)
+        if not (len(axes['params']) and len(axes['latitudes']) and len(axes['longitudes'])):
+            return None  # nothing inside the ingest filter
+
+        def fill(values):
+            with metrics.span("forecast_csv_ingest"):
+                return fill_forecast_values(directory, csv_files, axes, values, INGEST_BBOX, INGEST_PARAMS)
+
+        try:
+            warnings = write_forecast_store(run_dir, source, axes, fill)
+            cube = open_forecast_store(run_dir, source)
+            cube['warnings'] = warnings
+        except OSError as e:
+            # No writable store: ingest into memory instead
+            values = np.full(forecast_shape(axes), np.nan, dtype=np.float32)
+            warnings = fill(values)
+            values.flags.writeable = False
+            cube = make_forecast_cube(axes['params'], axes['latitudes'], axes['longitudes'], axes['time_cols'],
+                                      axes['forecast_date'], values)
+            cube['warnings'] = warnings + [f"Could not write forecast store: {e}"]
+
+    cube['run_id'] = run_id
+    cube['source'] = source
+    cube['csv_files'] = csv_files
+    if not derived:
+        cube.update(daily=None, zones=None, alerts=None, exceedance=None)
+        return cube
+    with metrics.span("daily_aggregates"):
+        cube['daily'] = load_daily_aggregates(cube, store_dir)
+    with metrics.span("zonal_statistics"):
+        cube['zones'] = load_zonal_statistics(cube, store_dir)
+    config = load_alert_config(alert_config)
+    with metrics.span("rainfall_alerts"):
+        cube['alerts'] = load_rainfall_alerts(cube, run_dir, config)
+    with metrics.span("exceedance_regions"):
+        cube['exceedance'] = load_exceedance_regions(cube, run_dir, config)
+    return cube
+
+
+# ==========================
+# On-disk forecast store: fixed-layout float32 arrays (values.f32, daily.f32) plus JSON manifests.
+# Every process maps the same files, so the page cache is shared and only touched cells are read.
+# ==========================
+def prune_forecast_store(store_dir, keep_run_ids=(), retain=2):
+    # Removes stored runs beyond the newest `retain`, never one in keep_run_ids. Maps already
+    # open on a removed run stay valid (POSIX); where the OS refuses, the run is left for later.
+    try:
+        stored = [d for d in os.listdir(store_dir)
+                  if os.path.isdir(os.path.join(store_dir, d)) and is_run_id(d)]
+    except OSError:
+        return []
+    removed = []
+    for run_id in sorted(stored, key=run_sort_key, reverse=True)[retain:]:
+        if run_id in keep_run_ids:
+            continue
+        try:
+            shutil.rmtree(os.path.join(store_dir, run_id))
+            removed.append(run_id)
+        except OSError:
+            pass
+    return removed
+
+def source_fingerprint(directory, csv_files):
+    fingerprint = []
+    for file in csv_files:
+        stat = os.stat(os.path.join(directory, file))
+        fingerprint.append([file, stat.st_size, stat.st_mtime_ns])
+    # A store written under a different ingest filter holds a different grid
+    if INGEST_BBOX is not None or INGEST_PARAMS is not None:
+        fingerprint.append(['filter', INGEST_BBOX and list(INGEST_BBOX), INGEST_PARAMS])
+    return fingerprint
+
+def open_forecast_store(run_dir, source):
+    try:
+        with open(os.path.join(run_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != STORE_FORMAT or manifest['source'] != source:
+            return None
+        values = np.memmap(os.path.join(run_dir, "values.f32"), dtype=np.float32, mode='r',
+                           shape=tuple(manifest['shape']))
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return make_forecast_cube(manifest['params'], np.array(manifest['latitudes']),
+                              np.array(manifest['longitudes']), manifest['time_cols'],
+                              pd.Timestamp(manifest['forecast_date']), values)
+
+def load_daily_aggregates(cube, store_dir):
+    # Day summaries of a loaded run, mapped from the run directory like the values: computed and
+    # written once (at ingest), in memory only when the store cannot be written
+    run_dir = os.path.join(store_dir, cube['run_id'])
+    daily = open_daily_store(run_dir, cube)
+    if daily is None:
+        try:
+            write_daily_store(run_dir, cube)
+            daily = open_daily_store(run_dir, cube)
+        except (OSError, ValueError):
+            pass
+    return daily if daily is not None else compute_daily_aggregates(cube)
+
+def open_daily_store(run_dir, cube):
+    # Valid only for the same source files and the same store and day-summary formats
+    try:
+        with open(os.path.join(run_dir, "daily.json")) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != [STORE_FORMAT, DAILY_FORMAT] or manifest['source'] != cube['source']:
+            return None
+        values = np.memmap(os.path.join(run_dir, "daily.f32"), dtype=np.float32, mode='r',
+                           shape=tuple(manifest['shape']))
+    except (OSError, ValueError, KeyError):
+        return None
+    return daily_grid(cube, manifest['params'], [pd.Timestamp(d) for d in manifest['days']],
+                      manifest['lead_counts'], values)
+
+def write_daily_store(run_dir, cube):
+    # Computed a block of latitudes at a time straight into the map, so peak memory does not
+    # grow with the grid; same write order and temp names as write_forecast_store
+    names, starts, days = daily_layout(cube)
+    shape = (len(names), len(cube['latitudes']), len(cube['longitudes']), len(starts))
+    manifest = {
+        'format': [STORE_FORMAT, DAILY_FORMAT],
+        'source': cube['source'],
+        'params': names,
+        'days': [str(d) for d in days],
+        'lead_counts': np.diff(np.r_[starts, len(cube['time_cols'])]).tolist(),
+        'shape': list(shape),
+    }
+
+    os.makedirs(run_dir, exist_ok=True)
+    tmp = f".{os.getpid()}.tmp"
+    values = np.memmap(os.path.join(run_dir, "daily.f32" + tmp), dtype=np.float32, mode='w+', shape=shape)
+    fill_daily_values(cube, starts, values)
+    values.flush()
+    del values
+    os.replace(os.path.join(run_dir, "daily.f32" + tmp), os.path.join(run_dir, "daily.f32"))
+    with open(os.path.join(run_dir, "daily.json" + tmp), "w") as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(run_dir, "daily.json" + tmp), os.path.join(run_dir, "daily.json"))
+
+def forecast_shape(axes):
+    return (len(axes['params']), len(axes['latitudes']), len(axes['longitudes']), len(axes['time_cols']))
+
+def write_forecast_store(run_dir, source, axes, fill):
+    # fill(values) writes the cells into the preallocated, NaN-filled map and returns the ingest
+    # warnings, which are passed back; the array is never held in memory as a whole
+    os.makedirs(run_dir, exist_ok=True)
+    manifest = {
+        'format': STORE_FORMAT,
+        'source': source,
+        'params': axes['params'],
+        'latitudes': axes['latitudes'].tolist(),
+        'longitudes': axes['longitudes'].tolist(),
+        'time_cols': axes['time_cols'],
+        'forecast_date': str(axes['forecast_date']),
+        'shape': list(forecast_shape(axes)),
+    }
+
+    # Values first, manifest last: a reader only trusts values.f32 once the manifest matches.
+    # Temp names carry the pid so concurrent workers never write into each other's file.
+    tmp = f".{os.getpid()}.tmp"
+    values = np.memmap(os.path.join(run_dir, "values.f32" + tmp), dtype=np.float32, mode='w+',
+                       shape=forecast_shape(axes))
+    values[:] = np.nan
+    warnings = fill(values)
+    values.flush()
+    del values
+    os.replace(os.path.join(run_dir, "values.f32" + tmp), os.path.join(run_dir, "values.f32"))
+    with open(os.path.join(run_dir, "manifest.json" + tmp), "w") as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(run_dir, "manifest.json" + tmp), os.path.join(run_dir, "manifest.json"))
+    return warnings
+
+
+# ==========================
+# Dense forecast cube (param x latitude x longitude x lead hour)
+# ==========================
+def lead_hour(time_col):
+    return int(time_col.replace('h', ''))
+
+def make_forecast_cube(params, latitudes, longitudes, time_cols, forecast_date, values):
+    # The cube is shared by every session and thread, so its arrays are read-only
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    latitudes.flags.writeable = False
+    longitudes.flags.writeable = False
+    return {
+        'params': params,
+        'param_index': {p: i for i, p in enumerate(params)},
+        'latitudes': latitudes,
+        'longitudes': longitudes,
+        'time_cols': time_cols,
+        'time_index': {c: i for i, c in enumerate(time_cols)},
+        'lead_hours': np.array([lead_hour(c) for c in time_cols]),
+        'forecast_date': forecast_date,
+        'values': values,
+        'warnings': [],
+    }
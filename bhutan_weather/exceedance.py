@@ -0,0 +1,130 @@
+# ==========================
+# Grid-wide rainfall exceedance: accumulated precipitation per cell over sliding windows,
+# the alert threshold ladder applied to every cell, and exceeding cells grouped into connected
+# regions named after their nearest settlements. Computed once per run (see load_forecast).
+# ==========================
+import os
+
+import numpy as np
+
+from .aggregates import deaccumulate, run_totals
+from .alerts import load_run_product
+from .geo import haversine_km
+
+# Window length in hours; None accumulates over the whole run
+DEFAULT_WINDOWS = [{'label': "6 h", 'hours': 6}, {'label': "24 h", 'hours': 24}, {'label': "Full run", 'hours': None}]
+DEFAULT_SETTLEMENTS_PER_REGION = 3
+EXCEEDANCE_FORMAT = 2  # bumped whenever compute_exceedance_regions changes, so exceedance.json is recomputed
+
+def window_totals(cube, hours):
+    # (lat x lon) largest precipitation total over any `hours`-long window of the run. tp is
+    # accumulated since 0h, so a window ending at lead h is acc[h] minus acc at the last lead
+    # before h - hours (0 before the first lead). The series is rebuilt from its per-lead rises
+    # so a missing lead carries forward and a drop between chunks never goes negative.
+    precip = cube['values'][cube['param_index']['precipitation']]
+    if hours is None:
+        return run_totals(precip)  # also what the Live Rainfall Alert banner interpolates
+    accumulated = np.cumsum(np.nan_to_num(deaccumulate(precip)), axis=-1)
+    lead_hours = cube['lead_hours']
+    accumulated = np.concatenate([np.zeros(accumulated.shape[:-1] + (1,)), accumulated], axis=-1)
+    start = np.searchsorted(lead_hours, lead_hours - hours, side='right')
+    return (accumulated[..., 1:] - accumulated[..., start]).max(axis=-1)
+
+def exceedance_levels(totals, levels):
+    # Index into levels (highest first) per cell, -1 where nothing is reached; same rule as
+    # rainfall_level, and with the "Full run" window the same quantity as the banner's place
+    # totals, so a named place and the cells around it get consistent levels
+    level_idx = np.full(totals.shape, -1)
+    for i in reversed(range(len(levels))):
+        level_idx[totals >= levels[i]['min_mm']] = i
+    level_idx[totals <= levels[-1]['min_mm']] = -1
+    return level_idx
+
+def label_regions(mask):
+    # 8-connected components of a 2-D boolean mask: 0 is background, regions are 1..n.
+    # Every cell starts with its own flat index + 1 and takes the smallest label around it until
+    # nothing changes; jumping to the label's own label makes long regions converge quickly.
+    big = mask.size + 1
+    labels = np.where(mask, np.arange(1, mask.size + 1).reshape(mask.shape), big)
+    rows, cols = mask.shape
+    while True:
+        padded = np.pad(labels, 1, constant_values=big)
+        smallest = np.min([padded[1 + dr:1 + dr + rows, 1 + dc:1 + dc + cols]
+                           for dr in (-1, 0, 1) for dc in (-1, 0, 1)], axis=0)
+        smallest = np.where(mask, smallest, big)
+        smallest[mask] = smallest.flat[smallest[mask] - 1]
+        if np.array_equal(smallest, labels):
+            break
+        labels = smallest
+
+    # Renumber 1..n in order of first appearance
+    labels = np.where(mask, labels, 0)
+    ids, labels = np.unique(labels, return_inverse=True)
+    return labels.reshape(mask.shape) + (ids[0] != 0)
+
+def cell_areas_km2(cube):
+    # Area around every grid point, from the spacing of the sorted axes
+    def steps(axis):
+        return np.gradient(axis) if len(axis) > 1 else np.zeros(len(axis))
+    lat_km = steps(cube['latitudes']) * 111
+    lon_km = steps(cube['longitudes'])[None, :] * 111 * np.cos(np.radians(cube['latitudes']))[:, None]
+    return np.abs(lat_km[:, None] * lon_km)
+
+def compute_exceedance_regions(cube, config):
+    # One entry per connected region and window, highest level first; None without precipitation
+    if "precipitation" not in cube['param_index']:
+        return None
+    settings = config.get('exceedance', {})
+    settlements = config['locations']
+    n_settlements = settings.get('settlements_per_region', DEFAULT_SETTLEMENTS_PER_REGION)
+    latitudes, longitudes = cube['latitudes'], cube['longitudes']
+    areas = cell_areas_km2(cube)
+
+    regions = []
+    for window in settings.get('windows', DEFAULT_WINDOWS):
+        levels = window.get('levels', config['levels'])
+        totals = window_totals(cube, window['hours'])
+        level_idx = exceedance_levels(totals, levels)
+        labels = label_regions(level_idx >= 0)
+
+        # Exceeding cells grouped by region with one sort
+        cells = np.flatnonzero(labels)
+        if not len(cells):
+            continue
+        cells = cells[np.argsort(labels.flat[cells], kind='stable')]
+        for region_cells in np.split(cells, np.flatnonzero(np.diff(labels.flat[cells])) + 1):
+            lat_idx, lon_idx = np.unravel_index(region_cells, labels.shape)
+            region_totals = totals[lat_idx, lon_idx]
+            peak = np.argmax(region_totals)
+            level = levels[level_idx[lat_idx, lon_idx].min()]
+
+            # Distance from each settlement to the closest exceeding cell of the region
+            distances = haversine_km(np.array([s['lat'] for s in settlements])[:, None],
+                                     np.array([s['lon'] for s in settlements])[:, None],
+                                     latitudes[lat_idx][None, :], longitudes[lon_idx][None, :]).min(axis=1)
+            nearest = np.argsort(distances)[:n_settlements]
+
+            regions.append({
+                'window': window['label'],
+                'hours': window['hours'],
+                'alert_level': level['label'],
+                'color': level['color'],
+                'min_mm': level['min_mm'],
+                'peak_mm': round(float(region_totals[peak]), 2),
+                'peak_lat': float(latitudes[lat_idx[peak]]),
+                'peak_lon': float(longitudes[lon_idx[peak]]),
+                'cells': len(lat_idx),
+                'area_km2': round(float(areas[lat_idx, lon_idx].sum()), 1),
+                'bounds': [[float(latitudes[lat_idx].min()), float(longitudes[lon_idx].min())],
+                           [float(latitudes[lat_idx].max()), float(longitudes[lon_idx].max())]],
+                'settlements': [{'name': settlements[i]['name'], 'distance_km': round(float(distances[i]), 1)}
+                                for i in nearest],
+            })
+
+    # Windows in configured order; within a window the most severe, then wettest, region first
+    order = {w['label']: i for i, w in enumerate(settings.get('windows', DEFAULT_WINDOWS))}
+    return sorted(regions, key=lambda r: (order[r['window']], -r['min_mm'], -r['peak_mm']))
+
+def load_exceedance_regions(cube, run_dir, config):
+    return load_run_product(os.path.join(run_dir, "exceedance.json"), cube, config, compute_exceedance_regions,
+                            EXCEEDANCE_FORMAT)
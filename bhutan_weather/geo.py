@@ -0,0 +1,41 @@
+# ==========================
+# Distances and radius queries on the forecast grid
+# ==========================
+import numpy as np
+
+def radius_in_degrees(lat_center, radius_km=10):
+    lat_deg = radius_km / 111
+    lon_deg = radius_km / (111 * np.cos(np.radians(lat_center)))
+    return lat_deg, lon_deg
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    # Great-circle distance on a 6371 km sphere; broadcasts over arrays
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(a))
+
+def cells_within_radius(cube, lat_center, lon_center, radius_km=10):
+    # The sorted axes act as the spatial index: the bounding box is two searchsorted ranges
+    lat_radius, lon_radius = radius_in_degrees(lat_center, radius_km)
+    latitudes = cube['latitudes']
+    longitudes = cube['longitudes']
+
+    lat_start = np.searchsorted(latitudes, lat_center - lat_radius, side='left')
+    lat_stop = np.searchsorted(latitudes, lat_center + lat_radius, side='right')
+    lon_start = np.searchsorted(longitudes, lon_center - lon_radius, side='left')
+    lon_stop = np.searchsorted(longitudes, lon_center + lon_radius, side='right')
+
+    # Exact distance test only for the cells inside the box
+    lat_idx, lon_idx = np.meshgrid(np.arange(lat_start, lat_stop), np.arange(lon_start, lon_stop), indexing='ij')
+    dist = haversine_km(lat_center, lon_center, latitudes[lat_idx], longitudes[lon_idx])
+    inside = dist <= radius_km
+    return lat_idx[inside], lon_idx[inside]
+
+def points_within_radius(cube, lat_center, lon_center, radius_km=10):
+    # Sum over the cells within radius_km for every param and lead: (n_params x n_leads),
+    # NaN where no cell in the radius has data
+    lat_idx, lon_idx = cells_within_radius(cube, lat_center, lon_center, radius_km)
+    values = cube['values'][:, lat_idx, lon_idx, :].astype(np.float64)
+    totals = np.nansum(values, axis=1)
+    totals[np.isnan(values).all(axis=1)] = np.nan
+    return totals
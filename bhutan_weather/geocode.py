@@ -0,0 +1,88 @@
+# ==========================
+# Geocode location: offline gazetteer, then persistent cache, then Nominatim
+# ==========================
+import functools
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from . import http_client, metrics
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "gazetteer.csv")
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "geocode_cache.sqlite")
+GEOCODE_TTL_SECONDS = 30 * 24 * 3600
+GEOCODE_MISS_TTL_SECONDS = 3600  # "not found" answers are retried sooner
+GEOCODE_CACHE_MAX_ENTRIES = 10000
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+
+def geocode_key(locality, gewog_thromde, dzongkhag):
+    # Case- and whitespace-insensitive locality|gewog|dzongkhag key
+    return "|".join(" ".join(str(p).lower().split()) for p in (locality, gewog_thromde, dzongkhag))
+
+@functools.lru_cache(maxsize=None)
+def load_gazetteer(path=GAZETTEER_PATH):
+    # Optional CSV with locality,gewog_thromde,dzongkhag,lat,lon columns
+    if not os.path.exists(path):
+        return {}
+    gaz = pd.read_csv(path)
+    keys = [geocode_key(*row) for row in gaz[['locality', 'gewog_thromde', 'dzongkhag']].itertuples(index=False)]
+    return dict(zip(keys, zip(gaz['lat'].astype(float), gaz['lon'].astype(float))))
+
+def geocode_cache_connect():
+    conn = sqlite3.connect(GEOCODE_CACHE_PATH, timeout=5)
+    conn.execute("CREATE TABLE IF NOT EXISTS geocode "
+                 "(key TEXT PRIMARY KEY, lat REAL, lon REAL, expires REAL, accessed REAL)")
+    return conn
+
+def geocode_cache_get(key):
+    # Returns (lat, lon) -- (None, None) for a cached miss -- or None when not cached
+    try:
+        with closing(geocode_cache_connect()) as conn, conn:
+            row = conn.execute("SELECT lat, lon, expires FROM geocode WHERE key = ?", (key,)).fetchone()
+            if row is None or row[2] < time.time():
+                return None
+            conn.execute("UPDATE geocode SET accessed = ? WHERE key = ?", (time.time(), key))
+        return row[0], row[1]
+    except sqlite3.Error:
+        return None
+
+def geocode_cache_put(key, lat, lon):
+    ttl = GEOCODE_TTL_SECONDS if lat is not None else GEOCODE_MISS_TTL_SECONDS
+    try:
+        with closing(geocode_cache_connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)",
+                         (key, lat, lon, time.time() + ttl, time.time()))
+            # Bound the size by evicting the least recently used entries
+            conn.execute("DELETE FROM geocode WHERE key IN (SELECT key FROM geocode ORDER BY accessed DESC "
+                         "LIMIT -1 OFFSET ?)", (GEOCODE_CACHE_MAX_ENTRIES,))
+    except sqlite3.Error:
+        pass
+
+def geocode_location(locality, gewog_thromde, dzongkhag):
+    # Returns (lat, lon), or (None, None) when the place is unknown; network errors raise
+    key = geocode_key(locality, gewog_thromde, dzongkhag)
+    gazetteer = load_gazetteer()
+    if key in gazetteer:
+        metrics.incr("geocode_lookups_total", source="gazetteer")
+        return gazetteer[key]
+    cached = geocode_cache_get(key)
+    if cached is not None:
+        metrics.incr("geocode_lookups_total", source="cache")
+        return cached
+
+    metrics.incr("geocode_lookups_total", source="nominatim")
+    query = f"{locality}, {gewog_thromde}, {dzongkhag}, Bhutan"
+    params = {"q": query, "format": "json"}
+    with metrics.span("geocode_nominatim"):
+        response = http_client.get(NOMINATIM_URL, params=params)
+    results = response.json() if response.status_code == 200 else None
+    if results:
+        lat, lon = float(results[0]['lat']), float(results[0]['lon'])
+        geocode_cache_put(key, lat, lon)
+        return lat, lon
+    if results is not None:
+        geocode_cache_put(key, None, None)
+    return None, None
@@ -0,0 +1,129 @@
+# ==========================
+# Shared HTTP client for all external calls (Nominatim, Overpass)
+# One pooled keep-alive session per process, per-host concurrency limits,
+# default timeouts, retry with jittered exponential backoff, and counters.
+# ==========================
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from . import metrics
+
+# requests is imported when the first client is built, so importing the package stays cheap
+
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+DEFAULT_RETRIES = 2
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Concurrent in-flight requests allowed per host; Nominatim's usage policy asks for one
+HOST_CONCURRENCY = {
+    "nominatim.openstreetmap.org": 1,
+    "overpass-api.de": 2,
+}
+DEFAULT_HOST_CONCURRENCY = 4
+
+
+class HttpClient:
+    def __init__(self, user_agent="forecast-app", pool_size=16, host_concurrency=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = user_agent
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.host_concurrency = dict(HOST_CONCURRENCY if host_concurrency is None else host_concurrency)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                limit = self.host_concurrency.get(host, DEFAULT_HOST_CONCURRENCY)
+                self._semaphores[host] = threading.BoundedSemaphore(limit)
+            return self._semaphores[host]
+
+    def _record(self, host, latency=None, error=False, retry=False):
+        with self._lock:
+            s = self._stats.setdefault(host, {'requests': 0, 'errors': 0, 'retries': 0,
+                                              'latency_total': 0.0, 'latency_max': 0.0})
+            if latency is not None:
+                s['requests'] += 1
+                s['latency_total'] += latency
+                s['latency_max'] = max(s['latency_max'], latency)
+            s['errors'] += int(error)
+            s['retries'] += int(retry)
+
+    def get(self, url, params=None, headers=None, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES):
+        # Returns the last response (callers check status_code); raises once network errors
+        # outlast the retries. A full per-host slot also counts as a timeout.
+        import requests
+
+        host = urlsplit(url).netloc
+        semaphore = self._semaphore(host)
+        wait = timeout[0] + timeout[1] if isinstance(timeout, tuple) else timeout
+
+        for attempt in range(retries + 1):
+            if not semaphore.acquire(timeout=wait):
+                self._record(host, error=True)
+                raise requests.Timeout(f"Too many concurrent requests to {host}")
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(host, latency=time.perf_counter() - start, error=True)
+                if attempt == retries:
+                    raise
+            else:
+                self._record(host, latency=time.perf_counter() - start,
+                             error=response.status_code >= 400)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+            finally:
+                semaphore.release()
+
+            # Full jitter keeps many workers from retrying in lockstep
+            self._record(host, retry=True)
+            time.sleep(random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)))
+
+    def stats(self):
+        with self._lock:
+            return {host: dict(s) for host, s in self._stats.items()}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    # Process-wide client, created on first use and shared by every session and thread
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
+
+def stats():
+    return get_client().stats()
+
+@metrics.register_collector
+def _client_metrics():
+    # Only reports once something has made an external call
+    if _client is None:
+        return {}
+    by_host = _client.stats().items()
+    return {
+        'http_requests_total': [({'host': h}, s['requests']) for h, s in by_host],
+        'http_errors_total': [({'host': h}, s['errors']) for h, s in by_host],
+        'http_retries_total': [({'host': h}, s['retries']) for h, s in by_host],
+        'http_request_seconds_total': [({'host': h}, round(s['latency_total'], 6)) for h, s in by_host],
+        'http_request_seconds_max': [({'host': h}, round(s['latency_max'], 6)) for h, s in by_host],
+    }
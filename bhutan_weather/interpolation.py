@@ -0,0 +1,116 @@
+# ==========================
+# Bilinear interpolation on the forecast cube
+# ==========================
+import numpy as np
+
+def find_surrounding_points(cube, lat, lon, param, time_col):
+    if param not in cube['param_index'] or time_col not in cube['time_index']:
+        return None
+    latitudes = cube['latitudes']
+    longitudes = cube['longitudes']
+
+    # Nearest grid lines at or below/above the point; equal when the point sits on a grid line
+    i_below = np.searchsorted(latitudes, lat, side='right') - 1
+    i_above = np.searchsorted(latitudes, lat, side='left')
+    j_left = np.searchsorted(longitudes, lon, side='right') - 1
+    j_right = np.searchsorted(longitudes, lon, side='left')
+
+    if i_below < 0 or j_left < 0 or i_above >= len(latitudes) or j_right >= len(longitudes):
+        return None
+
+    field = cube['values'][cube['param_index'][param], :, :, cube['time_index'][time_col]]
+    Q11 = float(field[i_below, j_left])
+    Q21 = float(field[i_below, j_right])
+    Q12 = float(field[i_above, j_left])
+    Q22 = float(field[i_above, j_right])
+
+    if np.isnan([Q11, Q21, Q12, Q22]).any():
+        return None
+
+    return {
+        'lat_below': latitudes[i_below],
+        'lat_above': latitudes[i_above],
+        'lon_left': longitudes[j_left],
+        'lon_right': longitudes[j_right],
+        'Q11': Q11,
+        'Q21': Q21,
+        'Q12': Q12,
+        'Q22': Q22
+    }
+
+def bilinear_interpolation(data, lat, lon):
+    x1, x2 = data['lon_left'], data['lon_right']
+    y1, y2 = data['lat_below'], data['lat_above']
+    x, y = lon, lat
+
+    Q11 = data['Q11']
+    Q21 = data['Q21']
+    Q12 = data['Q12']
+    Q22 = data['Q22']
+
+    denom = (x2 - x1) * (y2 - y1)
+    if denom < 1e-4:
+        return np.mean([Q11, Q21, Q12, Q22])
+
+    term1 = Q11 * (x2 - x) * (y2 - y)
+    term2 = Q21 * (x - x1) * (y2 - y)
+    term3 = Q12 * (x2 - x) * (y - y1)
+    term4 = Q22 * (x - x1) * (y - y1)
+
+    return (term1 + term2 + term3 + term4) / denom
+
+def interpolate_points(cube, lats, lons, params=None):
+    # Batch bilinear interpolation: (n_points x n_params x n_leads), NaN where a point has no data
+    lats = np.atleast_1d(np.asarray(lats, dtype=float))
+    lons = np.atleast_1d(np.asarray(lons, dtype=float))
+    params = cube['params'] if params is None else list(params)
+    latitudes = cube['latitudes']
+    longitudes = cube['longitudes']
+
+    p_idx = np.array([cube['param_index'].get(p, -1) for p in params], dtype=int)
+    i_below = np.searchsorted(latitudes, lats, side='right') - 1
+    i_above = np.searchsorted(latitudes, lats, side='left')
+    j_left = np.searchsorted(longitudes, lons, side='right') - 1
+    j_right = np.searchsorted(longitudes, lons, side='left')
+    inside = (i_below >= 0) & (j_left >= 0) & (i_above < len(latitudes)) & (j_right < len(longitudes))
+
+    # Clip so points outside the grid can be gathered safely, then masked below
+    i_below = np.clip(i_below, 0, len(latitudes) - 1)
+    i_above = np.clip(i_above, 0, len(latitudes) - 1)
+    j_left = np.clip(j_left, 0, len(longitudes) - 1)
+    j_right = np.clip(j_right, 0, len(longitudes) - 1)
+
+    # Gather only the four corner cells per point: each is (n_params, n_points, n_leads)
+    p = np.clip(p_idx, 0, None)[:, None]
+    values = cube['values']
+    Q11 = values[p, i_below[None, :], j_left[None, :]].astype(np.float64)
+    Q21 = values[p, i_below[None, :], j_right[None, :]].astype(np.float64)
+    Q12 = values[p, i_above[None, :], j_left[None, :]].astype(np.float64)
+    Q22 = values[p, i_above[None, :], j_right[None, :]].astype(np.float64)
+
+    x1, x2 = longitudes[j_left], longitudes[j_right]
+    y1, y2 = latitudes[i_below], latitudes[i_above]
+    x, y = lons, lats
+    denom = (x2 - x1) * (y2 - y1)
+    degenerate = denom < 1e-4
+
+    # Same terms as bilinear_interpolation, broadcast over params and leads
+    w = lambda a: a[None, :, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = (Q11 * w((x2 - x) * (y2 - y)) +
+                  Q21 * w((x - x1) * (y2 - y)) +
+                  Q12 * w((x2 - x) * (y - y1)) +
+                  Q22 * w((x - x1) * (y - y1))) / w(denom)
+    result = np.where(w(degenerate), (Q11 + Q21 + Q12 + Q22) / 4, result)
+
+    result[:, ~inside, :] = np.nan
+    result[p_idx < 0] = np.nan
+    return result.transpose(1, 0, 2)
+
+def clean_value(param, value):
+    # Display form of an interpolated value: None when missing, runoff floored at 0
+    if value is None or np.isnan(value):
+        return None
+    if param == "surface_area" and value < 0.01:
+        value = 0
+    return round(value, 2)
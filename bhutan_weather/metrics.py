@@ -0,0 +1,142 @@
+# ==========================
+# Lightweight instrumentation: named spans and counters, aggregated per process,
+# exported as Prometheus text (/metrics) and optionally as one JSON line per rerun.
+#
+#   with metrics.span("geocode"): ...
+#   metrics.incr("geocode_lookups_total", source="cache")
+#   metrics.register_collector(fn)  # fn() -> {metric_name: [(labels, value), ...]}, read at scrape time
+# ==========================
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from wsgiref.simple_server import make_server
+
+METRICS_LOG_PATH = os.getenv("METRICS_LOG_PATH")  # JSON-lines rerun log, off unless set
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Prometheus endpoint for the app process, off unless set
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_stages = {}  # stage -> [count, total seconds, max seconds]
+_collectors = []
+_trace = contextvars.ContextVar("metrics_trace", default=None)
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def incr(name, value=1, **labels):
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def register_collector(fn):
+    with _lock:
+        _collectors.append(fn)
+    return fn
+
+def unregister_collector(fn):
+    # For collectors bound to an object: drop it when the object is disposed, so the registry
+    # does not keep it (and whatever it holds) alive
+    with _lock:
+        if fn in _collectors:
+            _collectors.remove(fn)
+
+def record(name, elapsed):
+    with _lock:
+        s = _stages.setdefault(name, [0, 0.0, 0.0])
+        s[0] += 1
+        s[1] += elapsed
+        s[2] = max(s[2], elapsed)
+
+@contextmanager
+def span(name):
+    # Times the block into the process totals and, if one is active, the current rerun's trace
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        record(name, elapsed)
+        trace = _trace.get()
+        if trace is not None:
+            trace['spans'].append({'stage': name, 'seconds': elapsed, 'thread': threading.current_thread().name})
+
+def begin_trace(**fields):
+    # Starts collecting spans for one rerun/request; worker threads see it through copy_context()
+    trace = {'started': time.time(), 'start': time.perf_counter(), 'spans': [], **fields}
+    _trace.set(trace)
+    return trace
+
+def current_trace():
+    return _trace.get()
+
+def end_trace(trace):
+    trace['total_seconds'] = time.perf_counter() - trace['start']
+    _trace.set(None)
+    record("rerun_total", trace['total_seconds'])
+    if METRICS_LOG_PATH:
+        entry = {k: v for k, v in trace.items() if k != 'start'}
+        try:
+            with open(METRICS_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError:
+            pass
+    return trace
+
+def snapshot():
+    # Counters (own and collected) and stage totals as plain dicts
+    with _lock:
+        counters = dict(_counters)
+        stages = {name: list(s) for name, s in _stages.items()}
+        collectors = list(_collectors)
+    for fn in collectors:
+        try:
+            collected = fn()
+        except Exception:
+            continue
+        for name, samples in collected.items():
+            for labels, value in samples:
+                counters[(name, _labels_key(labels))] = value
+    return counters, stages
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _sample(name, labels, value):
+    label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}"
+
+def prometheus_text():
+    counters, stages = snapshot()
+    lines = []
+    typed = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+        lines.append(_sample(name, labels, value))
+
+    lines.append("# TYPE app_stage_seconds summary")
+    for stage, (count, total, _) in sorted(stages.items()):
+        lines.append(_sample("app_stage_seconds_count", (('stage', stage),), count))
+        lines.append(_sample("app_stage_seconds_sum", (('stage', stage),), f"{total:.6f}"))
+    lines.append("# TYPE app_stage_seconds_max gauge")
+    for stage, (_, _, longest) in sorted(stages.items()):
+        lines.append(_sample("app_stage_seconds_max", (('stage', stage),), f"{longest:.6f}"))
+    return "\n".join(lines) + "\n"
+
+def metrics_application(environ, start_response):
+    payload = prometheus_text().encode()
+    start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4'), ('Content-Length', str(len(payload)))])
+    return [payload]
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    # Serves prometheus_text() on a daemon thread; returns the server, or None when disabled
+    if not port:
+        return None
+    server = make_server(host, port, metrics_application)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
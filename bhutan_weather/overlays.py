@@ -0,0 +1,74 @@
+# ==========================
+# Raster overlays: every param x lead field of a run rendered once to a PNG for the map,
+# colored with one vectorized lookup over the whole lead stack and cached per run
+# ==========================
+import base64
+
+import numpy as np
+
+from . import metrics
+from .cache import TTLCache
+
+# Color ramps as (position 0..1, RGBA) stops; low precipitation and runoff fade to transparent
+OVERLAY_COLORMAPS = {
+    "precipitation": [(0.0, (255, 255, 255, 0)), (0.15, (166, 206, 227, 150)),
+                      (0.5, (31, 120, 180, 200)), (1.0, (106, 61, 154, 230))],
+    "temperature_celcius": [(0.0, (49, 54, 149, 170)), (0.35, (116, 173, 209, 170)),
+                            (0.6, (254, 224, 144, 170)), (1.0, (165, 0, 38, 190))],
+    "surface_area": [(0.0, (255, 255, 255, 0)), (0.3, (199, 233, 180, 160)),
+                     (1.0, (37, 52, 148, 220))],
+}
+OVERLAY_CACHE_RUNS = 4  # (run, param) layer sets kept in memory
+
+_overlay_cache = TTLCache(OVERLAY_CACHE_RUNS * len(OVERLAY_COLORMAPS))
+
+@metrics.register_collector
+def _overlay_cache_metrics():
+    s = _overlay_cache.stats()
+    return {
+        'overlay_cache_hits_total': [({}, s['hits'])],
+        'overlay_cache_misses_total': [({}, s['misses'])],
+    }
+
+def colorize(values, vmin, vmax, stops):
+    # values (..., lat, lon) -> uint8 RGBA (..., lat, lon, 4); NaN cells are fully transparent
+    span = vmax - vmin if vmax > vmin else 1.0
+    scaled = np.clip((values - vmin) / span, 0, 1)
+    positions = [p for p, _ in stops]
+    rgba = np.stack([np.interp(scaled, positions, [c[k] for _, c in stops]) for k in range(4)], axis=-1)
+    rgba[np.isnan(values)] = 0
+    return rgba.astype(np.uint8)
+
+def overlay_bounds(cube):
+    # Cells are centred on the grid points, so the image extends half a step past the outer ones
+    lats, lons = cube['latitudes'], cube['longitudes']
+    half_lat = (lats[-1] - lats[0]) / (len(lats) - 1) / 2 if len(lats) > 1 else 0
+    half_lon = (lons[-1] - lons[0]) / (len(lons) - 1) / 2 if len(lons) > 1 else 0
+    return [[float(lats[0] - half_lat), float(lons[0] - half_lon)],
+            [float(lats[-1] + half_lat), float(lons[-1] + half_lon)]]
+
+def render_overlays(cube, param):
+    # One PNG data URL per lead on a color scale shared by every lead of the run
+    from folium.utilities import write_png
+
+    field = np.moveaxis(np.asarray(cube['values'][cube['param_index'][param]], dtype=np.float32), -1, 0)
+    if np.isnan(field).all():
+        vmin, vmax = 0.0, 1.0
+    else:
+        vmin, vmax = float(np.nanmin(field)), float(np.nanmax(field))
+    rgba = colorize(field, vmin, vmax, OVERLAY_COLORMAPS[param])
+    images = ["data:image/png;base64," + base64.b64encode(write_png(layer, origin='lower')).decode()
+              for layer in rgba]
+    return {'images': images, 'bounds': overlay_bounds(cube), 'vmin': vmin, 'vmax': vmax}
+
+def forecast_overlays(cube, param):
+    # Cached per run: switching lead or rerunning the page only picks a stored image
+    if param not in cube['param_index'] or param not in OVERLAY_COLORMAPS:
+        return None
+    key = (cube['run_id'], str(cube['source']), param)
+    overlays = _overlay_cache.get(key)
+    if overlays is None:
+        with metrics.span("overlay_render"):
+            overlays = render_overlays(cube, param)
+        _overlay_cache.put(key, overlays)
+    return overlays
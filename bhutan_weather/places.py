@@ -0,0 +1,86 @@
+# ==========================
+# Nearby places: pluggable backend behind a tile-keyed TTL/LRU cache
+# ==========================
+import functools
+import json
+import os
+
+import numpy as np
+
+from . import http_client, metrics
+from .cache import TTLCache
+from .geo import haversine_km
+
+PLACES_BACKEND = os.getenv("PLACES_BACKEND", "overpass")  # "overpass" or "static"
+PLACES_INDEX_PATH = os.getenv("PLACES_INDEX_PATH", "places_index.json")
+PLACES_TILE_DEGREES = 0.01  # ~1 km tiles
+PLACES_CACHE_TTL_SECONDS = 24 * 3600
+PLACES_CACHE_MAX_TILES = 2048
+OVERPASS_URL = os.getenv("OVERPASS_URL", "http://overpass-api.de/api/interpreter")
+
+_tile_cache = TTLCache(PLACES_CACHE_MAX_TILES, PLACES_CACHE_TTL_SECONDS)
+
+@metrics.register_collector
+def _tile_cache_metrics():
+    s = _tile_cache.stats()
+    return {
+        'places_tile_cache_hits_total': [({}, s['hits'])],
+        'places_tile_cache_misses_total': [({}, s['misses'])],
+        'places_tile_cache_entries': [({}, s['size'])],
+    }
+
+def fetch_places_overpass(lat, lon, radius_m):
+    overpass_query = f"""
+    [out:json][timeout:10];
+    (
+      node["place"="city"](around:{radius_m},{lat},{lon});
+      node["place"="town"](around:{radius_m},{lat},{lon});
+      node["place"="village"](around:{radius_m},{lat},{lon});
+      node["place"="hamlet"](around:{radius_m},{lat},{lon});
+    );
+    out body;
+    """
+    # Strict client timeout (connect, read) so a slow Overpass cannot stall the page
+    response = http_client.get(OVERPASS_URL, params={'data': overpass_query}, timeout=(3, 10), retries=1)
+    response.raise_for_status()
+    places = []
+    for element in response.json().get('elements', []):
+        if 'tags' in element and 'name' in element['tags']:
+            places.append({'name': element['tags']['name'], 'lat': element['lat'], 'lon': element['lon']})
+    return places
+
+@functools.lru_cache(maxsize=None)
+def load_places_index(path=PLACES_INDEX_PATH):
+    # Static stand-in for Overpass: a JSON list of {"name", "lat", "lon"} places
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def fetch_places_static(lat, lon, radius_m):
+    places = load_places_index()
+    dist = haversine_km(lat, lon, np.array([p['lat'] for p in places]), np.array([p['lon'] for p in places]))
+    return [p for p, d in zip(places, dist) if d * 1000 <= radius_m]
+
+PLACES_BACKENDS = {
+    "overpass": fetch_places_overpass,
+    "static": fetch_places_static,
+}
+
+def fetch_places_tile(tile_lat, tile_lon, radius_m, backend):
+    # Query around the tile centre with the radius padded by a tile width, so the result
+    # covers the radius of any point inside the tile. Failures raise and are not cached.
+    key = (tile_lat, tile_lon, radius_m, backend)
+    places = _tile_cache.get(key)
+    if places is None:
+        lat, lon = tile_lat * PLACES_TILE_DEGREES, tile_lon * PLACES_TILE_DEGREES
+        with metrics.span(f"places_fetch_{backend}"):
+            places = PLACES_BACKENDS[backend](lat, lon, radius_m + int(PLACES_TILE_DEGREES * 111000))
+        _tile_cache.put(key, places)
+    return places
+
+def nearby_places(lat, lon, radius_m=10000, limit=10):
+    tile_lat, tile_lon = round(lat / PLACES_TILE_DEGREES), round(lon / PLACES_TILE_DEGREES)
+    places = fetch_places_tile(tile_lat, tile_lon, radius_m, PLACES_BACKEND)
+
+    # Trim the tile's superset back to the exact radius around this point
+    dist = haversine_km(lat, lon, np.array([p['lat'] for p in places]), np.array([p['lon'] for p in places]))
+    return [p for p, d in zip(places, dist) if d * 1000 <= radius_m][:limit]
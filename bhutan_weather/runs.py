@@ -0,0 +1,116 @@
+# ==========================
+# Forecast runs as versioned units: the current run keeps serving while a newer cycle is
+# ingested on a background thread, then swapped in with a single reference assignment.
+# Callers read current() once per rerun/request, so they never see a half-loaded run.
+# ==========================
+import os
+import threading
+
+from . import metrics
+from .data import (group_forecast_csvs, latest_run_id, load_forecast, prune_forecast_store, run_has_marker,
+                   source_fingerprint)
+from .series import clear_series_cache
+
+FORECAST_POLL_SECONDS = int(os.getenv("FORECAST_POLL_SECONDS", "60"))  # 0 disables the background refresh
+FORECAST_RETENTION = int(os.getenv("FORECAST_RETENTION", "2"))  # stored runs kept, newest first
+
+
+class ForecastRuns:
+    def __init__(self, directory="csv_files", store_dir="forecast_store", alert_config="alert_config.json",
+                 retain=FORECAST_RETENTION):
+        self.directory = directory
+        self.store_dir = store_dir
+        self.alert_config = alert_config
+        self.retain = retain
+        self.last_error = None
+        self._lock = threading.Lock()  # one ingest at a time
+        self._stop = threading.Event()
+        self._thread = None
+        self._cube = None
+        self._rejected = None  # run found incomplete; retried once its files change or it is marked done
+        try:
+            self.refresh()
+        except Exception as e:  # e.g. a malformed run; serve nothing until the background refresh succeeds
+            self.last_error = str(e)
+            metrics.incr("forecast_refresh_errors_total")
+        metrics.register_collector(self._metrics)
+
+    def current(self):
+        # The served cube; a later swap never changes a cube that was already handed out
+        return self._cube
+
+    def refresh(self):
+        # Ingests the newest complete run if it is not the one being served; True when swapped
+        with self._lock:
+            runs = group_forecast_csvs(self.directory)
+            run_id = latest_run_id(self.directory, runs)
+            if run_id is None:
+                return False
+            current = self._cube
+            source = source_fingerprint(self.directory, runs[run_id])
+            if current is not None and current['run_id'] == run_id and current['source'] == source:
+                return False
+            candidate = (run_id, source, run_has_marker(self.directory, run_id))
+            if self._rejected == candidate:
+                return False
+
+            cube = load_forecast(self.directory, self.store_dir, self.alert_config, run_id)
+            if cube is None:
+                return False
+            missing = self.missing_from(cube, current)
+            if missing:
+                self._rejected = candidate
+                self.last_error = f"Run {run_id} looks incomplete ({missing}); still serving {current['run_id']}"
+                metrics.incr("forecast_runs_rejected_total")
+                return False
+            self._cube = cube
+            self._rejected = None
+            clear_series_cache()  # entries are keyed per run; drop the old run's memory now
+            metrics.incr("forecast_run_swaps_total")
+            prune_forecast_store(self.store_dir, {run_id}, self.retain)
+            return True
+
+    def missing_from(self, cube, current):
+        # Without a done marker, a run that settled mid-copy (the exporter paused between files)
+        # would pass the settle check; it must at least have every param and as many files as
+        # the run it replaces. Returns what is missing, or None.
+        if current is None or run_has_marker(self.directory, cube['run_id']):
+            return None
+        missing_params = [p for p in current['params'] if p not in cube['param_index']]
+        if missing_params:
+            return "missing params: " + ", ".join(missing_params)
+        if len(cube['csv_files']) < len(current['csv_files']):
+            return f"{len(cube['csv_files'])} of {len(current['csv_files'])} files"
+        return None
+
+    def _metrics(self):
+        # Size of the served arrays; values is a shared read-only map, so pages are counted once per node
+        cube = self._cube
+        if cube is None:
+            return {}
+        return {'forecast_cube_bytes': [({'array': 'values', 'store': self.store_dir}, cube['values'].nbytes),
+                                        ({'array': 'daily', 'store': self.store_dir},
+                                         cube['daily']['values'].nbytes)]}
+
+    def start(self, interval=FORECAST_POLL_SECONDS):
+        # Polls for new cycles on a daemon thread; returns self so it chains after construction
+        if self._thread is None and interval > 0:
+            self._thread = threading.Thread(target=self._poll, args=(interval,), name="forecast-runs", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        # Ends polling and releases the metrics collector; call when disposing of the instance
+        self._stop.set()
+        metrics.unregister_collector(self._metrics)
+
+    def _poll(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                with metrics.span("forecast_refresh"):
+                    self.refresh()
+                if self._rejected is None:
+                    self.last_error = None
+            except Exception as e:  # keep serving the current run and try again next poll
+                self.last_error = str(e)
+                metrics.incr("forecast_refresh_errors_total")
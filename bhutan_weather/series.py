@@ -0,0 +1,59 @@
+# ==========================
+# Per-location forecast series, memoized process-wide. Keys are the run plus coordinates
+# quantized to ~100 m, and values are computed at the quantized point so every session sees
+# the same series for a cell. A new run never hits an old run's entries.
+# ==========================
+import os
+
+import numpy as np
+
+from . import metrics
+from .cache import TTLCache
+from .interpolation import interpolate_points
+
+SERIES_CACHE_SIZE = int(os.getenv("SERIES_CACHE_SIZE", "4096"))
+SERIES_QUANTUM_DEGREES = 0.001  # ~100 m in latitude
+
+_series_cache = TTLCache(SERIES_CACHE_SIZE)
+
+@metrics.register_collector
+def _series_cache_metrics():
+    s = _series_cache.stats()
+    return {
+        'series_cache_hits_total': [({}, s['hits'])],
+        'series_cache_misses_total': [({}, s['misses'])],
+        'series_cache_entries': [({}, s['size'])],
+    }
+
+def clear_series_cache():
+    _series_cache.clear()
+
+def location_series(cube, lats, lons, params=None, daily=False):
+    # Like interpolate_points: (n_points x n_params x n_leads), or the run's day summaries
+    # (n_points x n_stats x n_days) when daily. The full series per cell is what gets cached.
+    cells = list(zip(np.round(np.atleast_1d(lats) / SERIES_QUANTUM_DEGREES).astype(int).tolist(),
+                     np.round(np.atleast_1d(lons) / SERIES_QUANTUM_DEGREES).astype(int).tolist()))
+    run_key = (cube['run_id'], str(cube['source']), daily)
+    found = [_series_cache.get((run_key, cell)) for cell in cells]
+
+    # Misses are interpolated together in one batch call
+    grid = cube['daily'] if daily else cube
+    missing = [i for i, series in enumerate(found) if series is None]
+    if missing:
+        q_lats = [cells[i][0] * SERIES_QUANTUM_DEGREES for i in missing]
+        q_lons = [cells[i][1] * SERIES_QUANTUM_DEGREES for i in missing]
+        computed = interpolate_points(grid, q_lats, q_lons)
+        for i, series in zip(missing, computed):
+            series = series.copy()  # own memory, so one entry never pins the whole batch
+            series.flags.writeable = False
+            _series_cache.put((run_key, cells[i]), series)
+            found[i] = series
+
+    series = np.stack(found)
+    if params is None:
+        return series
+    # Unknown params come back as NaN, as from interpolate_points
+    p_idx = [grid['param_index'].get(p, -1) for p in params]
+    selected = series[:, p_idx]
+    selected[:, [i < 0 for i in p_idx]] = np.nan
+    return selected
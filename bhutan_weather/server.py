@@ -0,0 +1,156 @@
+# ==========================
+# JSON batch endpoint for machine-to-machine access
+#   POST /v1/interpolate  {"points": [{"lat": .., "lon": .., "id": ..}, ...], "params": [...],
+#                          "valid_times": [...]}  (optional ISO times, UTC unless an offset is given, linear
+#                          between leads; default every lead)
+#   GET  /v1/health
+#   GET  /v1/alerts        grid-wide rainfall exceedance regions of the served run
+#   GET  /metrics          Prometheus text (see bhutan_weather.metrics)
+# Run with `python -m bhutan_weather.server`, or serve `application` from any WSGI server.
+# ==========================
+import argparse
+import json
+import math
+import os
+import threading
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, make_server
+
+import pandas as pd
+
+from . import metrics
+from .aggregates import interpolate_times, valid_times
+from .interpolation import interpolate_points
+from .runs import ForecastRuns
+
+FORECAST_DIR = os.getenv("FORECAST_DIR", "csv_files")
+FORECAST_STORE_DIR = os.getenv("FORECAST_STORE_DIR", "forecast_store")
+MAX_POINTS = 10000
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+_runs = None
+_runs_lock = threading.Lock()
+
+def get_cube():
+    # Loaded on first request and shared by every request thread; newer runs are swapped in
+    # by the background refresh
+    global _runs
+    with _runs_lock:
+        if _runs is None:
+            _runs = ForecastRuns(FORECAST_DIR, FORECAST_STORE_DIR).start()
+    return _runs.current()
+
+def parse_valid_times(values):
+    # ISO strings only (a number would be read as epoch nanoseconds). Times with an offset, e.g.
+    # 2025-09-14T09:00+06:00 in Bhutan time, are converted to UTC, which the naive lead times are in.
+    if not isinstance(values, list) or not all(isinstance(t, str) for t in values):
+        raise ValueError("'valid_times' must be a list of ISO timestamp strings")
+    times = []
+    for text in values:
+        try:
+            t = pd.Timestamp(text)
+        except ValueError:
+            raise ValueError(f"Invalid valid time: {text!r}")
+        if t is pd.NaT:
+            raise ValueError(f"Invalid valid time: {text!r}")
+        times.append(t.tz_convert(None) if t.tzinfo is not None else t)
+    return pd.DatetimeIndex(times)
+
+def interpolate_batch(cube, request):
+    # Interpolated series for every requested point, param and lead; ValueError on a bad request
+    points = request.get('points') if isinstance(request, dict) else None
+    if not isinstance(points, list) or not points:
+        raise ValueError("'points' must be a non-empty list")
+    if len(points) > MAX_POINTS:
+        raise ValueError(f"At most {MAX_POINTS} points per request")
+    params = request.get('params') or cube['params']
+    if not isinstance(params, list) or not all(isinstance(p, str) for p in params):
+        raise ValueError("'params' must be a list of param names")
+    unknown = [p for p in params if p not in cube['param_index']]
+    if unknown:
+        raise ValueError(f"Unknown params: {', '.join(unknown)}")
+    try:
+        lats = [float(p['lat']) for p in points]
+        lons = [float(p['lon']) for p in points]
+    except (TypeError, KeyError, ValueError):
+        raise ValueError("Every point needs numeric 'lat' and 'lon'")
+    # "nan" and "inf" pass float() but would end up as bare NaN in the JSON response
+    if not all(math.isfinite(v) for v in lats + lons):
+        raise ValueError("Every point needs finite 'lat' and 'lon'")
+
+    if request.get('valid_times') is None:
+        times = valid_times(cube)
+        values = interpolate_points(cube, lats, lons, params)
+    else:
+        times = parse_valid_times(request['valid_times'])
+        values = interpolate_times(cube, lats, lons, times, params)
+
+    # Missing values (outside the grid or the forecast range) become null
+    values = values.astype(object)
+    values[pd.isna(values)] = None
+    values = values.tolist()
+
+    lead_hours = (times - cube['forecast_date']) / pd.Timedelta(hours=1)
+    return {
+        'run_id': cube['run_id'],
+        'forecast_date': cube['forecast_date'].isoformat(),
+        'params': params,
+        'lead_hours': [int(h) if float(h).is_integer() else float(h) for h in lead_hours],
+        'valid_times': [t.isoformat() for t in times],
+        'points': [
+            {'id': point.get('id'), 'lat': lat, 'lon': lon, 'series': dict(zip(params, series))}
+            for point, lat, lon, series in zip(points, lats, lons, values)
+        ],
+    }
+
+def application(environ, start_response):
+    method = environ['REQUEST_METHOD']
+    path = environ.get('PATH_INFO', '')
+    if path == '/metrics':
+        return metrics.metrics_application(environ, start_response)
+    cube = get_cube()
+
+    if cube is None:
+        status, body = '503 Service Unavailable', {'error': "No forecast data loaded"}
+    elif path == '/v1/health':
+        status, body = '200 OK', {'status': 'ok', 'run_id': cube['run_id']}
+    elif path == '/v1/alerts':
+        status, body = '200 OK', {'run_id': cube['run_id'], 'regions': cube['exceedance'] or []}
+    elif path != '/v1/interpolate':
+        status, body = '404 Not Found', {'error': f"Unknown path {path}"}
+    elif method != 'POST':
+        status, body = '405 Method Not Allowed', {'error': "Use POST"}
+    else:
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            if length > MAX_BODY_BYTES:
+                raise ValueError("Request body too large")
+            request = json.loads(environ['wsgi.input'].read(length) or b'null')
+            with metrics.span("api_interpolate"):
+                status, body = '200 OK', interpolate_batch(cube, request)
+        except ValueError as e:  # includes malformed JSON
+            status, body = '400 Bad Request', {'error': str(e)}
+
+    known_path = path if path in ('/v1/health', '/v1/alerts', '/v1/interpolate') else 'other'
+    metrics.incr("api_requests_total", path=known_path, status=status.split()[0])
+
+    payload = json.dumps(body).encode()
+    start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(payload)))])
+    return [payload]
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve interpolated forecasts as JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+
+    get_cube()  # load before accepting requests
+    with make_server(args.host, args.port, application, server_class=ThreadingWSGIServer) as server:
+        print(f"Serving forecasts on http://{args.host}:{args.port}/v1/interpolate")
+        server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# ==========================
+# Zonal statistics per boundary polygon (dzongkhag, gewog, ...): area-weighted mean, max and sum
+# of every field and lead. Cell/polygon overlap weights depend only on the grid geometry, so they
+# are computed once, stored as a CSR sparse matrix under the forecast store, and every run (and
+# its day summaries) is then aggregated with one sparse product instead of point-in-polygon tests.
+# ==========================
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from . import metrics
+from .cache import TTLCache
+from .exceedance import cell_areas_km2
+
+# GeoJSON FeatureCollection of (Multi)Polygons, e.g. the 20 dzongkhags; unset disables area summaries
+ZONES_PATH = os.getenv("ZONES_PATH")
+ZONE_NAME_FIELD = os.getenv("ZONE_NAME_FIELD", "name")
+ZONE_SUBSAMPLES = 8  # sample points per cell side; the overlap is the share of them inside a polygon
+ZONE_WEIGHTS_DIR = "zones"  # under the forecast store, next to the run directories
+
+_weights_cache = TTLCache(4)
+
+def load_zones(path=ZONES_PATH):
+    # [(name, rings)] with every ring of a feature as an (n x 2) lon/lat array; holes and
+    # multi-part features need no special case under the even-odd rule
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f)['features']
+    zones = []
+    for i, feature in enumerate(features):
+        geometry = feature['geometry']
+        polygons = [geometry['coordinates']] if geometry['type'] == "Polygon" else geometry['coordinates']
+        rings = [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon]
+        name = (feature.get('properties') or {}).get(ZONE_NAME_FIELD, f"zone {i + 1}")
+        zones.append((str(name), rings))
+    return zones
+
+def points_in_rings(lons, lats, rings, block=4096):
+    # Even-odd ray casting, vectorized over points x edges in blocks of points
+    inside = np.zeros(len(lons), dtype=bool)
+    for ring in rings:
+        x1, y1 = ring[:, 0], ring[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        for start in range(0, len(lons), block):
+            x, y = lons[start:start + block, None], lats[start:start + block, None]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                crossing = ((y1 > y) != (y2 > y)) & (x < (x2 - x1) * (y - y1) / (y2 - y1) + x1)
+            inside[start:start + block] ^= np.count_nonzero(crossing, axis=1) % 2 == 1
+    return inside
+
+def cell_edges(axis):
+    # Cells are centred on the grid points and extend half a step past the outer ones
+    if len(axis) < 2:
+        return np.array([axis[0], axis[0]], dtype=np.float64)
+    mid = (axis[1:] + axis[:-1]) / 2
+    return np.r_[2 * axis[0] - mid[0], mid, 2 * axis[-1] - mid[-1]]
+
+def overlap_weights(latitudes, longitudes, zones, subsamples=ZONE_SUBSAMPLES):
+    # CSR matrix (zones x flat lat/lon cells) of the share of each cell inside each zone
+    lat_edges, lon_edges = cell_edges(latitudes), cell_edges(longitudes)
+    lat_steps, lon_steps = np.diff(lat_edges), np.diff(lon_edges)
+    offsets = (np.arange(subsamples) + 0.5) / subsamples
+    indptr, indices, fractions = [0], [], []
+    for _, rings in zones:
+        # Only cells overlapping the zone's bounding box are sampled
+        points = np.concatenate(rings)
+        lat_range = slice(max(np.searchsorted(lat_edges, points[:, 1].min(), side='right') - 1, 0),
+                          np.searchsorted(lat_edges, points[:, 1].max(), side='left'))
+        lon_range = slice(max(np.searchsorted(lon_edges, points[:, 0].min(), side='right') - 1, 0),
+                          np.searchsorted(lon_edges, points[:, 0].max(), side='left'))
+        lat_idx, lon_idx = np.meshgrid(np.arange(len(latitudes))[lat_range], np.arange(len(longitudes))[lon_range],
+                                       indexing='ij')
+        lat_idx, lon_idx = lat_idx.ravel(), lon_idx.ravel()
+
+        # subsamples x subsamples points per candidate cell
+        sample_lats = lat_edges[lat_idx, None, None] + lat_steps[lat_idx, None, None] * offsets[None, :, None]
+        sample_lons = lon_edges[lon_idx, None, None] + lon_steps[lon_idx, None, None] * offsets[None, None, :]
+        sample_lats, sample_lons = np.broadcast_arrays(sample_lats, sample_lons)
+        inside = points_in_rings(sample_lons.ravel(), sample_lats.ravel(), rings)
+        share = inside.reshape(len(lat_idx), subsamples * subsamples).mean(axis=1)
+
+        keep = share > 0
+        indices.append(lat_idx[keep] * len(longitudes) + lon_idx[keep])
+        fractions.append(share[keep])
+        indptr.append(indptr[-1] + int(keep.sum()))
+    return {
+        'names': [name for name, _ in zones],
+        'indptr': np.array(indptr, dtype=np.int64),
+        'indices': np.concatenate(indices or [np.empty(0, dtype=np.int64)]).astype(np.int64),
+        'fractions': np.concatenate(fractions or [np.empty(0)]),
+    }
+
+def load_zone_weights(cube, store_dir, path=ZONES_PATH):
+    # Weights for the cube's grid, from memory, the store, or computed and stored; None when no
+    # boundary file is configured. The key covers the grid axes and the boundary file, not the run.
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise FileNotFoundError(f"Boundary file {path} (ZONES_PATH) cannot be read: {e}") from e
+    source = [os.path.abspath(path), stat.st_size, stat.st_mtime_ns, ZONE_NAME_FIELD, ZONE_SUBSAMPLES]
+    digest = hashlib.sha1(json.dumps(source).encode())
+    digest.update(cube['latitudes'].tobytes())
+    digest.update(cube['longitudes'].tobytes())
+    key = digest.hexdigest()
+
+    weights = _weights_cache.get(key)
+    if weights is not None:
+        return weights
+    weights_path = os.path.join(store_dir, ZONE_WEIGHTS_DIR, key + ".npz")
+    try:
+        with np.load(weights_path) as stored:
+            weights = {'names': stored['names'].tolist(), 'indptr': stored['indptr'],
+                       'indices': stored['indices'], 'fractions': stored['fractions']}
+    except (OSError, ValueError, KeyError):
+        with metrics.span("zone_weights"):
+            weights = overlap_weights(cube['latitudes'], cube['longitudes'], load_zones(path))
+        try:
+            os.makedirs(os.path.dirname(weights_path), exist_ok=True)
+            tmp = weights_path + f".{os.getpid()}.tmp.npz"
+            np.savez(tmp, names=np.array(weights['names'], dtype=str), indptr=weights['indptr'],
+                     indices=weights['indices'], fractions=weights['fractions'])
+            os.replace(tmp, weights_path)
+        except OSError:
+            pass
+    _weights_cache.put(key, weights)
+    return weights
+
+def segment_reduce(ufunc, x, indptr, empty):
+    # ufunc.reduceat over the CSR rows of x's second axis; rows without cells get `empty`
+    counts = np.diff(indptr)
+    out = np.full(x.shape[:1] + (len(counts),) + x.shape[2:], empty, dtype=np.float64)
+    rows = counts > 0
+    if rows.any():
+        out[:, rows] = ufunc.reduceat(x, indptr[:-1][rows], axis=1)
+    return out
+
+def zonal_statistics(grid, weights):
+    # For a cube-like dict (field x lat x lon x lead): (zone x field x lead) arrays of
+    # 'mean' (area-weighted), 'max' (over cells touching the zone) and 'sum' (cells weighted
+    # by their share inside the zone). NaN cells are skipped; a zone without data is NaN.
+    n_fields, n_lat, n_lon, n_steps = grid['values'].shape
+    values = np.asarray(grid['values']).reshape(n_fields, n_lat * n_lon, n_steps)
+    cells = values[:, weights['indices'], :].astype(np.float64)
+    valid = ~np.isnan(cells)
+    filled = np.where(valid, cells, 0)
+
+    area = (weights['fractions'] * cell_areas_km2(grid).ravel()[weights['indices']])[None, :, None]
+    fractions = weights['fractions'][None, :, None]
+    indptr = weights['indptr']
+    weighted = segment_reduce(np.add, filled * area, indptr, 0)
+    covered = segment_reduce(np.add, valid * area, indptr, 0)
+    total = segment_reduce(np.add, filled * fractions, indptr, 0)
+    peak = segment_reduce(np.fmax, cells, indptr, np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats = {'mean': weighted / covered, 'max': peak, 'sum': np.where(covered > 0, total, np.nan)}
+    for name, array in stats.items():
+        array = np.ascontiguousarray(np.moveaxis(array, 1, 0), dtype=np.float32)
+        array.flags.writeable = False
+        stats[name] = array
+    return {'zones': weights['names'], 'params': grid['params'], 'param_index': grid['param_index'], **stats}
+
+def load_zonal_statistics(cube, store_dir, path=ZONES_PATH):
+    # {'leads': ..., 'daily': ...} zonal statistics of a run, or None when no boundary file is configured
+    weights = load_zone_weights(cube, store_dir, path)
+    if weights is None:
+        return None
+    return {'zone_index': {name: i for i, name in enumerate(weights['names'])},
+            'leads': zonal_statistics(cube, weights), 'daily': zonal_statistics(cube['daily'], weights)}
@@ -0,0 +1,24 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def alert_config():
+    # The shipped alert config: locations and the threshold ladder
+    return str(Path(__file__).resolve().parents[1] / "alert_config.json")
+
+
+@pytest.fixture
+def write_chunk():
+    # Writes one CSV chunk of a run on a 2 x 2 grid, every lead 1.0, settled long ago
+    def write(directory, run_id, suffix, params, leads, date="2025-09-14"):
+        rows = [{'longitude': lon, 'latitude': lat, 'forecast_date': date, 'param': param, 'param_tag': "x",
+                 **{lead: 1.0 for lead in leads}}
+                for param in params for lat in (27.0, 27.25) for lon in (89.5, 89.75)]
+        path = directory / f"ecmwf_data_{run_id}_oper_fc_{suffix}.csv"
+        pd.DataFrame(rows).to_csv(path, index=False)
+        os.utime(path, (0, 0))
+    return write
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from bhutan_weather.aggregates import compute_daily_aggregates, daily_layout, deaccumulate, fill_daily_values
+from bhutan_weather.data import make_forecast_cube
+
+
+def test_deaccumulate_keeps_first_lead_and_differences_the_rest():
+    np.testing.assert_allclose(deaccumulate([1.0, 3.0, 6.0, 6.0]), [1, 2, 3, 0])
+
+
+def test_deaccumulate_carries_a_missing_lead_into_the_next_one():
+    np.testing.assert_allclose(deaccumulate([1.0, np.nan, 4.0, 5.0]), [1, np.nan, 3, 1])
+
+
+def test_deaccumulate_never_goes_negative():
+    np.testing.assert_allclose(deaccumulate([[1.0, 3.0, 2.0, 5.0]]), [[1, 2, 0, 3]])
+
+
+def test_daily_precipitation_total_is_what_fell_that_day():
+    # 1 mm every 6 h, accumulated from 0h: 1, 2, ..., 8 at leads 6h..48h from 14 Sep 00:00.
+    # Valid times 06/12/18 on the 14th, 00/06/12/18 on the 15th, 00 on the 16th.
+    leads = [f"{h}h" for h in range(6, 54, 6)]
+    accumulated = np.arange(1, 9, dtype=np.float32)
+    temperature = np.array([10, 14, 12, 8, 9, 15, 13, 7], dtype=np.float32)
+    values = np.stack([np.broadcast_to(accumulated, (1, 1, 8)), np.broadcast_to(temperature, (1, 1, 8))])
+    cube = make_forecast_cube(["precipitation", "temperature_celcius"], [27.0], [89.5], leads,
+                              pd.Timestamp(2025, 9, 14), values)
+
+    daily = compute_daily_aggregates(cube)
+    field = lambda name: daily['values'][daily['param_index'][name], 0, 0].tolist()
+    assert daily['lead_counts'].tolist() == [3, 4, 1]
+    assert field("precipitation_total") == [3, 4, 1]  # not 1+2+3, 4+5+6+7, 8
+    assert field("temperature_celcius_min") == [10, 8, 7]
+    assert field("temperature_celcius_max") == [14, 15, 7]
+    assert field("temperature_celcius_mean") == [12, 11.25, 7]
+
+
+def test_day_summaries_do_not_depend_on_the_block_size():
+    rng = np.random.default_rng(0)
+    values = np.stack([np.cumsum(rng.uniform(0, 2, (5, 3, 8)), axis=-1), rng.uniform(5, 25, (5, 3, 8))])
+    values[0, 1, 2, 3] = np.nan
+    cube = make_forecast_cube(["precipitation", "temperature_celcius"], np.linspace(26.8, 28.0, 5),
+                              [89.5, 89.75, 90.0], [f"{h}h" for h in range(6, 54, 6)], pd.Timestamp(2025, 9, 14),
+                              values.astype(np.float32))
+    names, starts, _ = daily_layout(cube)
+    whole, by_row = (np.empty((len(names), 5, 3, len(starts)), dtype=np.float32) for _ in range(2))
+    fill_daily_values(cube, starts, whole)
+    fill_daily_values(cube, starts, by_row, block_cells=1)  # one latitude at a time
+    np.testing.assert_array_equal(whole, by_row)
+    assert whole.dtype == np.float32
+    assert deaccumulate(values[0].astype(np.float32)).dtype == np.float32
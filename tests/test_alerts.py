@@ -0,0 +1,88 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from bhutan_weather import data
+from bhutan_weather.alerts import compute_rainfall_alerts, load_alert_config, load_run_product
+from bhutan_weather.exceedance import compute_exceedance_regions, window_totals
+from bhutan_weather.interpolation import interpolate_points
+
+
+def test_run_products_are_reused_until_the_run_config_or_version_changes(tmp_path):
+    path = str(tmp_path / "product.json")
+    cube = {'source': [["a.csv", 1, 1]]}
+    calls = []
+
+    def compute(cube, config):
+        calls.append(config)
+        return [len(calls)]
+
+    assert load_run_product(path, cube, {'levels': 1}, compute, 1) == [1]
+    assert load_run_product(path, cube, {'levels': 1}, compute, 1) == [1]  # stored
+    assert load_run_product(path, cube, {'levels': 1}, compute, 2) == [2]  # the computation changed
+    assert load_run_product(path, cube, {'levels': 2}, compute, 2) == [3]  # the config changed
+    assert load_run_product(path, {'source': [["a.csv", 1, 2]]}, {'levels': 2}, compute, 2) == [4]  # new files
+    assert json.loads((tmp_path / "product.json").read_text())['format'] == 2
+
+
+def test_run_products_stored_without_a_version_are_recomputed(tmp_path):
+    path = tmp_path / "product.json"
+    cube = {'source': [["a.csv", 1, 1]]}
+    load_run_product(str(path), cube, {}, lambda cube, config: ["new"], 1)
+    stored = json.loads(path.read_text())
+    del stored['format']
+    stored['result'] = ["stale"]
+    path.write_text(json.dumps(stored))
+    assert load_run_product(str(path), cube, {}, lambda cube, config: ["new"], 1) == ["new"]
+
+
+# ==========================
+# The banner and the regional alerts on the repo's sample run
+# ==========================
+@pytest.fixture(scope="module")
+def repo_cube(tmp_path_factory):
+    root = Path(__file__).resolve().parents[1]
+    return data.load_forecast(str(root / "csv_files"), str(tmp_path_factory.mktemp("store")),
+                              str(root / "alert_config.json"))
+
+
+def test_banner_totals_are_the_full_run_totals_at_each_place(repo_cube, alert_config):
+    config = load_alert_config(alert_config)
+    for level in config['levels']:
+        level['min_mm'] = 0
+    config['max_places'] = len(config['locations'])
+    totals = window_totals(repo_cube, None)
+    grid = {'param_index': {"precipitation": 0}, 'latitudes': repo_cube['latitudes'],
+            'longitudes': repo_cube['longitudes'], 'values': totals[None, :, :, None]}
+    expected = interpolate_points(grid, [p['lat'] for p in config['locations']],
+                                  [p['lon'] for p in config['locations']], ["precipitation"])[:, 0, 0]
+    expected = {p['name']: round(float(t), 2) for p, t in zip(config['locations'], np.nan_to_num(expected)) if t > 0}
+    assert {p['name']: p['precip'] for p in compute_rainfall_alerts(repo_cube, config)} == expected
+
+
+def test_shipped_levels_raise_neither_the_banner_nor_a_full_run_region(repo_cube):
+    assert repo_cube['alerts'] == []
+    assert [r for r in repo_cube['exceedance'] if r['window'] == "Full run"] == []
+
+
+def test_every_banner_place_lies_in_a_full_run_region_of_its_level(repo_cube, alert_config):
+    # A quarter of the shipped ladder, so that the sample run reaches it
+    config = load_alert_config(alert_config)
+    for level in config['levels']:
+        level['min_mm'] /= 4
+    banner = compute_rainfall_alerts(repo_cube, config)
+    regions = [r for r in compute_exceedance_regions(repo_cube, config) if r['window'] == "Full run"]
+    assert banner and regions
+
+    min_mm = {level['label']: level['min_mm'] for level in config['levels']}
+    locations = {p['name']: p for p in config['locations']}
+    step = max(np.diff(repo_cube['latitudes']).max(), np.diff(repo_cube['longitudes']).max())
+    for place in banner:
+        lat, lon = locations[place['name']]['lat'], locations[place['name']]['lon']
+        # An interpolated total never exceeds its largest corner, so one corner cell is at the
+        # place's level or above and the place is within a grid step of that cell's region
+        assert any(r['min_mm'] >= min_mm[place['alert_level']] and
+                   r['bounds'][0][0] - step <= lat <= r['bounds'][1][0] + step and
+                   r['bounds'][0][1] - step <= lon <= r['bounds'][1][1] + step for r in regions), place['name']
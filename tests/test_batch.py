@@ -0,0 +1,35 @@
+import pandas as pd
+
+from bhutan_weather import batch, data
+
+
+def write_gazetteer(path, n):
+    pd.DataFrame({'locality': [f"place {i}" for i in range(n)], 'gewog_thromde': "g", 'dzongkhag': "d",
+                  'lat': [27.0 + 0.25 * i / n for i in range(n)], 'lon': 89.6}).to_csv(path, index=False)
+
+
+def test_in_process_batch_loads_the_run_once_without_derived_products(tmp_path, monkeypatch, write_chunk):
+    write_chunk(tmp_path, "20250914000000", 1, ["precipitation"], ["6h", "12h", "18h", "24h"])
+    write_gazetteer(tmp_path / "gaz.csv", 3)
+    calls = []
+    real_load = data.load_forecast
+    monkeypatch.setattr(batch, "load_forecast", lambda *a, **kw: calls.append(kw) or real_load(*a, **kw))
+
+    summary = batch.run_batch(str(tmp_path / "gaz.csv"), str(tmp_path / "out.csv"), str(tmp_path),
+                              str(tmp_path / "store"), daily=True, workers=0)
+    assert summary['places'] == 3
+    assert [kw['derived'] for kw in calls] == [False]
+
+    out = pd.read_csv(tmp_path / "out.csv")
+    assert list(out['param']) == ["precipitation_total"] * 3
+    assert out["2025-09-14"].tolist() == [1.0] * 3  # 1 mm accumulated by 18h: 06-18 on the 14th
+    assert out["2025-09-15"].tolist() == [0.0] * 3
+
+
+def test_pool_batch_matches_in_process(tmp_path, write_chunk):
+    write_chunk(tmp_path, "20250914000000", 1, ["precipitation", "temperature_celcius"], ["6h", "12h"])
+    write_gazetteer(tmp_path / "gaz.csv", 7)
+    args = (str(tmp_path), str(tmp_path / "store"))
+    batch.run_batch(str(tmp_path / "gaz.csv"), str(tmp_path / "a.csv"), *args, workers=0, chunk_size=2)
+    batch.run_batch(str(tmp_path / "gaz.csv"), str(tmp_path / "b.csv"), *args, workers=2, chunk_size=2)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "a.csv"), pd.read_csv(tmp_path / "b.csv"))
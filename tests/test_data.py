@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bhutan_weather import data
+from bhutan_weather.aggregates import DAILY_FORMAT, compute_daily_aggregates, valid_times
+from bhutan_weather.data import lead_hour, parse_forecast_date
+
+
+@pytest.mark.parametrize("text", ["2025-09-04", "04-09-2025", "4-9-2025", "2025-09-04 00:00:00"])
+def test_parse_forecast_date_never_swaps_day_and_month(text):
+    assert parse_forecast_date(text) == pd.Timestamp(2025, 9, 4)
+
+
+def test_parse_forecast_date_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_forecast_date("yesterday")
+
+
+# ==========================
+# Streaming ingestion (load_forecast) on small hand-written runs
+# ==========================
+def write_run(directory, forecast_dates=("2025-09-04", "2025-09-04")):
+    # Two chunks of one run: leads 6h/12h and 18h/24h on a 2 x 2 grid, precipitation only
+    for i, (leads, date) in enumerate(zip((["6h", "12h"], ["18h", "24h"]), forecast_dates), start=1):
+        rows = [{'longitude': lon, 'latitude': lat, 'forecast_date': date, 'param': "precipitation",
+                 'param_tag': "tp", **{lead: lat + lon / 100 + lead_hour(lead) for lead in leads}}
+                for lat in (27.0, 27.25) for lon in (89.5, 89.75)]
+        pd.DataFrame(rows).to_csv(directory / f"ecmwf_data_20250904000000_run_{i}.csv", index=False)
+
+
+def test_iso_date_with_small_day_survives_chunked_ingestion(tmp_path, monkeypatch, alert_config):
+    monkeypatch.setattr(data, "CSV_CHUNK_ROWS", 1)
+    write_run(tmp_path, ("2025-09-04", "04-09-2025"))
+    cube = data.load_forecast(str(tmp_path), str(tmp_path / "store"), alert_config)
+    assert cube['forecast_date'] == pd.Timestamp(2025, 9, 4)
+    assert list(valid_times(cube)) == [pd.Timestamp(2025, 9, 4, h) for h in (6, 12, 18)] + [pd.Timestamp(2025, 9, 5)]
+    # Every cell of every lead came through the chunked scatter
+    np.testing.assert_allclose(cube['values'][0, 1, 0], [27.25 + 0.895 + h for h in (6, 12, 18, 24)], rtol=1e-6)
+    assert cube['warnings'] == []
+
+    # Reopened from the store with the same date
+    again = data.load_forecast(str(tmp_path), str(tmp_path / "store"), alert_config)
+    assert again['forecast_date'] == pd.Timestamp(2025, 9, 4)
+
+
+def test_run_mixing_forecast_dates_is_rejected(tmp_path, alert_config):
+    write_run(tmp_path, ("2025-09-04", "2025-09-05"))
+    with pytest.raises(ValueError, match="mix forecast dates"):
+        data.load_forecast(str(tmp_path), str(tmp_path / "store"), alert_config)
+
+
+def test_day_summaries_are_stored_with_the_run_and_mapped_on_later_loads(tmp_path, monkeypatch, alert_config):
+    write_run(tmp_path)
+    cube = data.load_forecast(str(tmp_path), str(tmp_path / "store"), alert_config)
+    run_dir = tmp_path / "store" / "20250904000000"
+    assert (run_dir / "daily.f32").exists() and (run_dir / "daily.json").exists()
+    daily = cube['daily']
+    assert daily['params'] == ["precipitation_total"]
+    assert daily['days'] == [pd.Timestamp(2025, 9, 4), pd.Timestamp(2025, 9, 5)]
+    assert daily['lead_counts'].tolist() == [3, 1]
+    # Cell (27.0, 89.5) accumulates to 27.895 + lead hour: 33.895 + 6 + 6 on the 4th, 6 on the 5th
+    np.testing.assert_allclose(daily['values'][0, 0, 0], [45.895, 6], rtol=1e-6)
+    np.testing.assert_array_equal(daily['values'], compute_daily_aggregates(cube)['values'])
+
+    # Warm loads map the stored summaries instead of computing them again
+    monkeypatch.setattr(data, "fill_daily_values", lambda *a, **kw: pytest.fail("recomputed"))
+    again = data.load_forecast(str(tmp_path), str(tmp_path / "store"), alert_config)
+    assert isinstance(again['daily']['values'], np.memmap)
+    assert again['daily']['days'] == daily['days']
+    np.testing.assert_array_equal(again['daily']['values'], daily['values'])
+
+
+def test_stored_day_summaries_of_an_older_format_are_recomputed(tmp_path, alert_config):
+    write_run(tmp_path)
+    cube = data.load_forecast(str(tmp_path), str(tmp_path / "store"), alert_config)
+    expected = np.array(cube['daily']['values'])
+
+    run_dir = tmp_path / "store" / "20250904000000"
+    manifest = json.loads((run_dir / "daily.json").read_text())
+    manifest['format'] = [data.STORE_FORMAT, DAILY_FORMAT - 1]
+    (run_dir / "daily.json").write_text(json.dumps(manifest))
+    (run_dir / "daily.f32").write_bytes(bytes(expected.nbytes))  # zeros
+
+    again = data.load_forecast(str(tmp_path), str(tmp_path / "store"), alert_config)
+    np.testing.assert_array_equal(again['daily']['values'], expected)
+    assert json.loads((run_dir / "daily.json").read_text())['format'] == [data.STORE_FORMAT, DAILY_FORMAT]
+
+
+def test_day_summaries_without_a_writable_store_are_computed_in_memory(tmp_path, alert_config):
+    write_run(tmp_path)
+    (tmp_path / "store").write_text("not a directory")
+    cube = data.load_forecast(str(tmp_path), str(tmp_path / "store"), alert_config)
+    assert not isinstance(cube['daily']['values'], np.memmap)
+    np.testing.assert_allclose(cube['daily']['values'][0, 0, 0], [45.895, 6], rtol=1e-6)
+
+
+def test_files_missing_cells_are_reported_per_file(tmp_path, monkeypatch, alert_config):
+    monkeypatch.setattr(data, "CSV_CHUNK_ROWS", 1)
+    cells = [(lat, lon) for lat in (27.0, 27.25) for lon in (89.5, 89.75)]
+    # Chunk 1 has every cell (one of them twice: the first row wins), chunk 2 lacks one, chunk 3 two
+    for i, (lead, rows) in enumerate([("6h", cells + [cells[0]]), ("12h", cells[1:]), ("18h", cells[2:])], start=1):
+        pd.DataFrame([{'longitude': lon, 'latitude': lat, 'forecast_date': "2025-09-04", 'param': "precipitation",
+                       'param_tag': "tp", lead: float(k)} for k, (lat, lon) in enumerate(rows)]
+                     ).to_csv(tmp_path / f"ecmwf_data_20250904000000_run_{i}.csv", index=False)
+
+    cube = data.load_forecast(str(tmp_path), str(tmp_path / "store"), alert_config)
+    assert cube['warnings'] == ["Forecast grids do not match; missing cells: "
+                                "ecmwf_data_20250904000000_run_2.csv (1), ecmwf_data_20250904000000_run_3.csv (2)"]
+    np.testing.assert_array_equal(cube['values'][0].reshape(4, 3),
+                                  [[0, np.nan, np.nan], [1, 0, np.nan], [2, 1, 0], [3, 2, 1]])
@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from bhutan_weather.data import make_forecast_cube
+from bhutan_weather.exceedance import compute_exceedance_regions, exceedance_levels, label_regions, window_totals
+
+LEVELS = [{'min_mm': 0.5, 'label': "Very high", 'color': "red"},
+          {'min_mm': 0.3, 'label': "High", 'color': "orange"},
+          {'min_mm': 0.2, 'label': "Moderate", 'color': "yellow"}]
+
+
+def precipitation_cube(values, latitudes=(27.0,), longitudes=(89.5,)):
+    values = np.asarray(values, dtype=np.float32)
+    leads = [f"{6 * (i + 1)}h" for i in range(values.shape[-1])]
+    return make_forecast_cube(["precipitation"], list(latitudes), list(longitudes), leads,
+                              pd.Timestamp(2025, 9, 14), values[None])
+
+
+def test_window_totals_difference_the_accumulated_series():
+    # Accumulated 2, 5, 5, 9, 10, 10, 16, 17 at 6h..48h: per-lead rain 2, 3, 0, 4, 1, 0, 6, 1
+    cube = precipitation_cube([[[2, 5, 5, 9, 10, 10, 16, 17]]])
+    assert window_totals(cube, 6).item() == 6      # 36h -> 42h
+    assert window_totals(cube, 12).item() == 7     # 36h -> 48h
+    assert window_totals(cube, 24).item() == 11    # 18h -> 42h: 16 - 5
+    assert window_totals(cube, None).item() == 17  # whole run, not 2 + 5 + ... + 17
+    assert window_totals(cube, 96).item() == 17    # longer than the run
+
+
+def test_window_totals_carry_a_missing_lead_and_ignore_drops():
+    # 12h missing: the 18h lead carries 2 -> 9; the drop at 24h counts as no rain and the
+    # rise back to 10 at 30h as 2, as in the daily totals
+    cube = precipitation_cube([[[2, np.nan, 9, 8, 10]]])
+    assert window_totals(cube, 6).item() == 7
+    assert window_totals(cube, 12).item() == 7
+    assert window_totals(cube, None).item() == 11
+
+
+def test_exceedance_levels_follow_the_threshold_ladder():
+    totals = np.array([0.0, 0.2, 0.25, 0.3, 0.49, 0.5, 3.0])
+    assert exceedance_levels(totals, LEVELS).tolist() == [-1, -1, 2, 1, 1, 0, 0]
+
+
+def test_label_regions_are_8_connected():
+    mask = np.array([[1, 0, 0, 1],
+                     [0, 1, 0, 0],
+                     [0, 0, 0, 1],
+                     [1, 1, 0, 1]], dtype=bool)
+    assert label_regions(mask).tolist() == [[1, 0, 0, 2],
+                                             [0, 1, 0, 0],
+                                             [0, 0, 0, 3],
+                                             [4, 4, 0, 3]]
+
+
+def test_label_regions_follow_a_long_snake():
+    mask = np.zeros((5, 5), dtype=bool)
+    mask[0], mask[1, 4], mask[2], mask[3, 0], mask[4] = True, True, True, True, True
+    labels = label_regions(mask)
+    assert set(labels[mask].tolist()) == {1}
+    assert (labels[~mask] == 0).all()
+
+
+def test_label_regions_empty_and_full_masks():
+    assert (label_regions(np.zeros((3, 4), dtype=bool)) == 0).all()
+    assert (label_regions(np.ones((3, 4), dtype=bool)) == 1).all()
+
+
+def test_compute_exceedance_regions_groups_and_names_regions():
+    # 6h totals on a 0.5 degree 3 x 3 grid: a very high cell joined to a high one, and a lone
+    # moderate cell in the opposite corner
+    totals = [[0.6, 0.35, 0.0],
+              [0.0, 0.0, 0.0],
+              [0.0, 0.0, 0.25]]
+    cube = precipitation_cube(np.array(totals)[..., None], latitudes=(27.0, 27.5, 28.0),
+                              longitudes=(89.0, 89.5, 90.0))
+    config = {'levels': LEVELS,
+              'locations': [{'name': "South-west", 'lat': 27.0, 'lon': 89.0},
+                            {'name': "North-east", 'lat': 28.0, 'lon': 90.0}],
+              'exceedance': {'windows': [{'label': "6 h", 'hours': 6}], 'settlements_per_region': 1}}
+
+    first, second = compute_exceedance_regions(cube, config)
+    assert (first['alert_level'], first['peak_mm'], first['cells']) == ("Very high", 0.6, 2)
+    assert (first['peak_lat'], first['peak_lon']) == (27.0, 89.0)
+    assert first['bounds'] == [[27.0, 89.0], [27.0, 89.5]]
+    assert first['settlements'] == [{'name': "South-west", 'distance_km': 0.0}]
+    # Two cells of 0.5 x 0.5 degrees at 27 N
+    assert first['area_km2'] == round(2 * 55.5 * 55.5 * math.cos(math.radians(27.0)), 1)
+
+    assert (second['alert_level'], second['peak_mm'], second['cells']) == ("Moderate", 0.25, 1)
+    assert second['settlements'] == [{'name': "North-east", 'distance_km': 0.0}]
+
+
+def test_compute_exceedance_regions_needs_precipitation():
+    cube = make_forecast_cube(["temperature_celcius"], [27.0], [89.5], ["6h"], pd.Timestamp(2025, 9, 14),
+                              np.zeros((1, 1, 1, 1), dtype=np.float32))
+    assert compute_exceedance_regions(cube, {'levels': LEVELS, 'locations': []}) is None
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bhutan_weather.data import make_forecast_cube
+from bhutan_weather.geo import cells_within_radius, haversine_km, points_within_radius
+
+
+@pytest.fixture
+def cube():
+    # 0.05 degree 5 x 5 grid centred on 27.0 N, 89.5 E: one step is 5.6 km north and 5.0 km east.
+    # Lead 6h of "counts" is 1 everywhere, lead 12h is 10 * row + column; "sparse" only has data
+    # at the centre (5) and in the south-west corner (100) at 6h.
+    rows, cols = np.meshgrid(np.arange(5), np.arange(5), indexing='ij')
+    counts = np.stack([np.ones((5, 5)), 10 * rows + cols], axis=-1)
+    sparse = np.full((5, 5, 2), np.nan)
+    sparse[2, 2, 0], sparse[0, 0, 0] = 5, 100
+    return make_forecast_cube(["counts", "sparse"], [26.9, 26.95, 27.0, 27.05, 27.1],
+                              [89.4, 89.45, 89.5, 89.55, 89.6], ["6h", "12h"], pd.Timestamp(2025, 9, 14),
+                              np.stack([counts, sparse]).astype(np.float32))
+
+
+def test_haversine_km():
+    assert haversine_km(27.0, 89.5, 27.0, 89.5) == 0
+    np.testing.assert_allclose(haversine_km(27.0, 89.5, 28.0, 89.5), 111.195, atol=1e-3)  # 1 degree north
+    np.testing.assert_allclose(haversine_km(27.0, 89.5, [27.05, 27.0], [89.5, 89.6]), [5.560, 9.907], atol=1e-3)
+
+
+def test_cells_within_radius(cube):
+    # The centre's 3 x 3 block and two steps east and west (9.9 km); two steps north or south is 11.1 km
+    lat_idx, lon_idx = cells_within_radius(cube, 27.0, 89.5, radius_km=10)
+    assert sorted(zip(lat_idx.tolist(), lon_idx.tolist())) == \
+        sorted([(i, j) for i in (1, 2, 3) for j in (1, 2, 3)] + [(2, 0), (2, 4)])
+
+
+def test_sums_within_the_radius_per_param_and_lead(cube):
+    totals = points_within_radius(cube, 27.0, 89.5, radius_km=10)
+    assert totals.shape == (2, 2)
+    # 11 cells; 10 * (1 + 2 + 3) * 3 + (1 + 2 + 3) * 3 for the block, plus 20 and 24
+    assert totals[0].tolist() == [11, 242]
+    # Missing cells are skipped; a lead without any data in the radius is NaN
+    assert totals[1, 0] == 5
+    assert np.isnan(totals[1, 1])
+
+
+def test_radius_without_a_cell_is_nan(cube):
+    # Between grid points, 3.7 km from the nearest one
+    assert np.isnan(points_within_radius(cube, 27.025, 89.525, radius_km=1)).all()
+    assert points_within_radius(cube, 27.025, 89.525, radius_km=1).shape == (2, 2)
+    # Off the grid
+    assert np.isnan(points_within_radius(cube, 30.0, 89.5, radius_km=10)).all()
@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from bhutan_weather import geocode, http_client, metrics, places
+from bhutan_weather.cache import TTLCache
+
+
+class Stub:
+    # Local HTTP server: routes map a path to a list of (status, payload, delay) answers given in
+    # turn (the last one repeats), or to a function of the query returning one
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                with stub._lock:
+                    stub.requests.append((url.path, query))
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    route = stub.routes[url.path]
+                    status, payload, delay = route(query) if callable(route) else \
+                        (route.pop(0) if len(route) > 1 else route[0])
+                try:
+                    time.sleep(delay)
+                    body = json.dumps(payload).encode()
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # the client gave up waiting
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True).start()
+
+    def url(self, path):
+        return f"http://{self.host}{path}"
+
+    def hits(self, path):
+        return sum(1 for p, _ in self.requests if p == path)
+
+
+@pytest.fixture
+def stub():
+    stub = Stub()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # A fresh process-wide client without backoff sleeps
+    monkeypatch.setattr(http_client, "BACKOFF_BASE_SECONDS", 0)
+    client = http_client.HttpClient()
+    monkeypatch.setattr(http_client, "_client", client)
+    return client
+
+
+def test_retries_a_503_then_returns_the_200(stub, client):
+    stub.routes['/data'] = [(503, {}, 0), (200, {'ok': True}, 0)]
+    response = client.get(stub.url("/data"))
+    assert response.status_code == 200
+    assert response.json() == {'ok': True}
+    assert stub.hits("/data") == 2
+    stats = client.stats()[stub.host]
+    assert (stats['requests'], stats['errors'], stats['retries']) == (2, 1, 1)
+
+
+def test_gives_up_with_the_last_response_after_the_retries(stub, client):
+    stub.routes['/data'] = [(503, {}, 0)]
+    assert client.get(stub.url("/data"), retries=2).status_code == 503
+    assert stub.hits("/data") == 3
+    assert client.stats()[stub.host]['retries'] == 2
+
+
+def test_read_timeout_raises_after_the_retries(stub, client):
+    stub.routes['/slow'] = [(200, {}, 0.5)]
+    with pytest.raises(requests.Timeout):
+        client.get(stub.url("/slow"), timeout=(1, 0.1), retries=1)
+    stats = client.stats()[stub.host]
+    assert (stats['requests'], stats['errors'], stats['retries']) == (2, 2, 1)
+
+
+def test_connect_failure_raises_after_the_retries(stub, client):
+    host = stub.host
+    stub.server.shutdown()
+    stub.server.server_close()  # nothing listens on the port any more
+    with pytest.raises(requests.ConnectionError):
+        client.get(f"http://{host}/data", timeout=(0.5, 0.5), retries=2)
+    stats = client.stats()[host]
+    assert (stats['requests'], stats['errors'], stats['retries']) == (3, 3, 2)
+
+
+def test_per_host_limit_caps_requests_in_flight(stub):
+    stub.routes['/slow'] = [(200, {}, 0.2)]
+    client = http_client.HttpClient(host_concurrency={stub.host: 2})
+    threads = [threading.Thread(target=client.get, args=(stub.url("/slow"),)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert stub.hits("/slow") == 6
+    assert stub.max_active == 2
+
+
+def test_a_full_host_slot_times_out(stub):
+    stub.routes['/slow'] = [(200, {}, 0.5)]
+    client = http_client.HttpClient(host_concurrency={stub.host: 1})
+    holder = threading.Thread(target=client.get, args=(stub.url("/slow"),))
+    holder.start()
+    time.sleep(0.1)
+    with pytest.raises(requests.Timeout, match="Too many concurrent requests"):
+        client.get(stub.url("/slow"), timeout=(0.05, 0.05))
+    holder.join()
+    assert client.stats()[stub.host]['errors'] == 1
+
+
+def test_counters_are_exported(stub, client):
+    stub.routes['/data'] = [(500, {}, 0), (200, {}, 0)]
+    http_client.get(stub.url("/data"))
+    assert http_client.stats()[stub.host]['requests'] == 2
+    text = metrics.prometheus_text()
+    assert f'http_requests_total{{host="{stub.host}"}} 2' in text
+    assert f'http_errors_total{{host="{stub.host}"}} 1' in text
+    assert f'http_retries_total{{host="{stub.host}"}} 1' in text
+    assert f'http_request_seconds_max{{host="{stub.host}"}}' in text
+
+
+@pytest.fixture
+def nominatim(stub, client, monkeypatch, tmp_path):
+    def search(query):
+        if query['q'].startswith("Changzamtog"):
+            return 200, [{'lat': "27.4622", 'lon': "89.6403"}], 0
+        return 200, [], 0
+    stub.routes['/search'] = search
+    monkeypatch.setattr(geocode, "NOMINATIM_URL", stub.url("/search"))
+    monkeypatch.setattr(geocode, "GEOCODE_CACHE_PATH", str(tmp_path / "geocode.sqlite"))
+    return stub
+
+
+def test_geocode_caches_hits(nominatim):
+    assert geocode.geocode_location("Changzamtog", "Thimphu Thromde", "Thimphu") == (27.4622, 89.6403)
+    assert nominatim.requests[0][1] == {'q': "Changzamtog, Thimphu Thromde, Thimphu, Bhutan", 'format': "json"}
+    # Same place, different case and spacing: from the SQLite cache
+    assert geocode.geocode_location(" changzamtog", "Thimphu  Thromde", "THIMPHU") == (27.4622, 89.6403)
+    assert nominatim.hits("/search") == 1
+
+
+def test_geocode_caches_misses_for_a_shorter_time(nominatim, monkeypatch):
+    assert geocode.geocode_location("Nowhere", "Nogewog", "Thimphu") == (None, None)
+    assert geocode.geocode_location("Nowhere", "Nogewog", "Thimphu") == (None, None)
+    assert nominatim.hits("/search") == 1
+
+    # Once the miss has expired the place is looked up again
+    monkeypatch.setattr(geocode, "GEOCODE_MISS_TTL_SECONDS", -1)
+    assert geocode.geocode_location("Elsewhere", "Nogewog", "Thimphu") == (None, None)
+    assert geocode.geocode_location("Elsewhere", "Nogewog", "Thimphu") == (None, None)
+    assert nominatim.hits("/search") == 3
+
+
+def test_geocode_does_not_cache_a_failed_lookup(nominatim):
+    nominatim.routes['/search'] = [(500, {}, 0)]
+    assert geocode.geocode_location("Changzamtog", "Thimphu Thromde", "Thimphu") == (None, None)
+    assert nominatim.hits("/search") == 3  # first try and two retries
+    assert geocode.geocode_cache_get(geocode.geocode_key("Changzamtog", "Thimphu Thromde", "Thimphu")) is None
+
+
+@pytest.fixture
+def overpass(stub, client, monkeypatch):
+    elements = [
+        {'lat': 27.4728, 'lon': 89.6393, 'tags': {'name': "Thimphu", 'place': "city"}},
+        {'lat': 27.4900, 'lon': 89.6500, 'tags': {'name': "Dechencholing", 'place': "village"}},
+        {'lat': 27.5000, 'lon': 89.9000, 'tags': {'name': "Far away", 'place': "village"}},
+        {'lat': 27.4700, 'lon': 89.6400, 'tags': {'place': "hamlet"}},  # no name
+    ]
+    stub.routes['/interpreter'] = [(200, {'elements': elements}, 0)]
+    monkeypatch.setattr(places, "OVERPASS_URL", stub.url("/interpreter"))
+    monkeypatch.setattr(places, "PLACES_BACKEND", "overpass")
+    monkeypatch.setattr(places, "_tile_cache", TTLCache(16, 60))
+    return stub
+
+
+def test_nearby_places_share_a_tile_fetch(overpass):
+    names = [p['name'] for p in places.nearby_places(27.4728, 89.6393, radius_m=5000)]
+    assert names == ["Thimphu", "Dechencholing"]
+    assert "around:6110,27.47,89.64" in overpass.requests[0][1]['data']  # radius padded by a tile
+
+    # Another point in the same ~1 km tile is trimmed from the cached tile, not fetched again
+    names = [p['name'] for p in places.nearby_places(27.4710, 89.6410, radius_m=5000, limit=1)]
+    assert names == ["Thimphu"]
+    assert overpass.hits("/interpreter") == 1
+    assert places._tile_cache.stats()['hits'] == 1
+
+    places.nearby_places(27.4900, 89.6500, radius_m=5000)
+    assert overpass.hits("/interpreter") == 2
+
+
+def test_nearby_places_failures_are_not_cached(overpass):
+    overpass.routes['/interpreter'] = [(503, {}, 0), (503, {}, 0), (200, {'elements': []}, 0)]
+    with pytest.raises(requests.HTTPError):
+        places.nearby_places(27.4728, 89.6393)
+    assert places.nearby_places(27.4728, 89.6393) == []
+    assert overpass.hits("/interpreter") == 3
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bhutan_weather.data import make_forecast_cube
+from bhutan_weather.interpolation import bilinear_interpolation, find_surrounding_points, interpolate_points
+
+
+@pytest.fixture
+def cube():
+    # Uneven 4 x 5 grid, three params, four leads, random values
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 30, size=(3, 4, 5, 4)).astype(np.float32)
+    return make_forecast_cube(["precipitation", "temperature_celcius", "surface_area"],
+                              [26.8, 27.0, 27.25, 28.0], [88.9, 89.5, 89.75, 90.5, 92.0],
+                              ["6h", "12h", "18h", "24h"], pd.Timestamp(2025, 9, 14), values)
+
+
+def scalar(cube, lat, lon, param, time_col):
+    # The one-point path on the cube
+    corners = find_surrounding_points(cube, lat, lon, param, time_col)
+    return np.nan if corners is None else bilinear_interpolation(corners, lat, lon)
+
+
+def frame_reference(df, lat, lon, param, time_col):
+    # The original lookup on the merged CSV frame, before the cube existed
+    df_param = df[df['param'] == param]
+    latitudes = np.sort(df_param['latitude'].unique())
+    longitudes = np.sort(df_param['longitude'].unique())
+    if not (np.any(latitudes <= lat) and np.any(latitudes >= lat) and
+            np.any(longitudes <= lon) and np.any(longitudes >= lon)):
+        return np.nan
+    y1, y2 = latitudes[latitudes <= lat].max(), latitudes[latitudes >= lat].min()
+    x1, x2 = longitudes[longitudes <= lon].max(), longitudes[longitudes >= lon].min()
+    at = lambda y, x: df_param[(df_param['latitude'] == y) & (df_param['longitude'] == x)][time_col].values[0]
+    return bilinear_interpolation({'lat_below': y1, 'lat_above': y2, 'lon_left': x1, 'lon_right': x2,
+                                   'Q11': at(y1, x1), 'Q21': at(y1, x2), 'Q12': at(y2, x1), 'Q22': at(y2, x2)},
+                                  lat, lon)
+
+
+def test_batch_matches_the_original_frame_lookup(cube):
+    rows = [{'latitude': lat, 'longitude': lon, 'param': param,
+             **{col: cube['values'][p, i, j, t] for t, col in enumerate(cube['time_cols'])}}
+            for p, param in enumerate(cube['params'])
+            for i, lat in enumerate(cube['latitudes']) for j, lon in enumerate(cube['longitudes'])]
+    df = pd.DataFrame(rows)
+
+    # Interior points, points on grid lines and corners, and points outside the grid
+    rng = np.random.default_rng(1)
+    lats = np.r_[rng.uniform(26.8, 28.0, 25), 27.0, 27.25, 26.8, 28.0, 27.1, 27.6, 26.5, 28.5]
+    lons = np.r_[rng.uniform(88.9, 92.0, 25), 89.2, 90.5, 88.9, 92.0, 89.5, 91.0, 89.6, 89.6]
+    batch = interpolate_points(cube, lats, lons)
+    assert batch.shape == (33, 3, 4)
+
+    for k, (lat, lon) in enumerate(zip(lats, lons)):
+        for p, param in enumerate(cube['params']):
+            for t, col in enumerate(cube['time_cols']):
+                expected = frame_reference(df, lat, lon, param, col)
+                np.testing.assert_allclose(batch[k, p, t], expected, rtol=0, atol=1e-6)
+                np.testing.assert_allclose(scalar(cube, lat, lon, param, col), expected, rtol=0, atol=1e-6)
+
+
+@pytest.fixture
+def plane():
+    # Corners 1, 2 (east), 3 (north), 4: the bilinear surface is 1 + 2 * north + east fractions
+    values = np.array([[1, 2], [3, 4]], dtype=np.float32)[None, :, :, None]
+    return make_forecast_cube(["precipitation"], [27.0, 27.5], [89.5, 90.0], ["6h"],
+                              pd.Timestamp(2025, 9, 14), values)
+
+
+def test_interior_points(plane):
+    result = interpolate_points(plane, [27.25, 27.125, 27.375], [89.75, 89.625, 89.875])[:, 0, 0]
+    np.testing.assert_allclose(result, [2.5, 1.75, 3.25])
+
+
+def test_points_on_grid_lines_take_the_mean_of_their_corners(plane):
+    # A grid line collapses the cell, and the old code then averaged the four (repeated) corners
+    result = interpolate_points(plane, [27.0, 27.0, 27.2, 27.5], [89.5, 89.6, 90.0, 90.0])[:, 0, 0]
+    np.testing.assert_allclose(result, [1, 1.5, 3, 4])
+
+
+def test_points_outside_the_grid_are_nan(plane):
+    result = interpolate_points(plane, [26.9, 27.6, 27.25, 27.25], [89.75, 89.75, 89.4, 90.1])
+    assert np.isnan(result).all()
+
+
+def test_a_nan_corner_only_blanks_the_points_that_use_it():
+    values = np.array([[[1, 2, 5], [3, 4, np.nan]]], dtype=np.float32)[..., None]
+    cube = make_forecast_cube(["precipitation"], [27.0, 27.5], [89.5, 90.0, 90.5], ["6h"],
+                              pd.Timestamp(2025, 9, 14), values)
+    result = interpolate_points(cube, [27.25, 27.25, 27.0], [89.75, 90.25, 90.25])[:, 0, 0]
+    np.testing.assert_allclose(result, [2.5, np.nan, 3.5])
+    assert find_surrounding_points(cube, 27.25, 90.25, "precipitation", "6h") is None
+
+
+def test_unknown_param_is_nan(plane):
+    result = interpolate_points(plane, [27.25], [89.75], ["snow", "precipitation"])
+    assert np.isnan(result[0, 0]).all()
+    np.testing.assert_allclose(result[0, 1], [2.5])
+    assert find_surrounding_points(plane, 27.25, 89.75, "snow", "6h") is None
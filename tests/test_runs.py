@@ -0,0 +1,67 @@
+import pytest
+
+from bhutan_weather import metrics
+from bhutan_weather.runs import ForecastRuns
+
+
+@pytest.fixture
+def served(tmp_path, write_chunk, alert_config):
+    # A two-chunk run being served; the test adds newer runs next to it
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    for suffix, leads in ((1, ["6h", "12h"]), (2, ["18h", "24h"])):
+        write_chunk(csv_dir, "20250914000000", suffix, ["precipitation", "temperature_celcius"], leads)
+    runs = ForecastRuns(str(csv_dir), str(tmp_path / "store"), alert_config)
+    yield csv_dir, runs
+    runs.stop()
+
+
+def test_run_missing_a_param_is_not_swapped_in(served, write_chunk):
+    csv_dir, runs = served
+    for suffix, leads in ((1, ["6h", "12h"]), (2, ["18h", "24h"])):
+        write_chunk(csv_dir, "20250914120000", suffix, ["precipitation"], leads)
+
+    assert runs.refresh() is False
+    assert runs.current()['run_id'] == "20250914000000"
+    assert "missing params: temperature_celcius" in runs.last_error
+
+    # A done marker vouches for the run, e.g. when a param was dropped on purpose
+    (csv_dir / "20250914120000.done").touch()
+    assert runs.refresh() is True
+    assert runs.current()['run_id'] == "20250914120000"
+
+
+def test_run_with_fewer_files_is_not_swapped_in(served, write_chunk):
+    csv_dir, runs = served
+    write_chunk(csv_dir, "20250914120000", 1, ["precipitation", "temperature_celcius"], ["6h", "12h"])
+
+    assert runs.refresh() is False
+    assert "1 of 2 files" in runs.last_error
+
+    write_chunk(csv_dir, "20250914120000", 2, ["precipitation", "temperature_celcius"], ["18h", "24h"])
+    assert runs.refresh() is True
+    assert runs.current()['run_id'] == "20250914120000"
+
+
+def test_malformed_first_run_is_reported_not_raised(tmp_path, write_chunk, alert_config):
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    write_chunk(csv_dir, "20250914000000", 1, ["precipitation"], ["6h"], date="2025-09-14")
+    write_chunk(csv_dir, "20250914000000", 2, ["precipitation"], ["12h"], date="2025-09-15")
+
+    runs = ForecastRuns(str(csv_dir), str(tmp_path / "store"), alert_config)
+    assert runs.current() is None
+    assert "mix forecast dates" in runs.last_error
+    runs.stop()
+
+
+def test_stop_releases_the_metrics_collector(served, tmp_path):
+    _, runs = served
+    store = str(tmp_path / "store")
+    sizes = lambda: [labels for (name, labels), _ in metrics.snapshot()[0].items()
+                     if name == "forecast_cube_bytes" and ('store', store) in labels]
+    assert len(sizes()) == 2
+
+    runs.stop()
+    assert sizes() == []
+    runs.stop()  # idempotent
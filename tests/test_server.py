@@ -0,0 +1,67 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bhutan_weather import server
+from bhutan_weather.data import make_forecast_cube
+
+
+@pytest.fixture
+def cube():
+    # 2 x 2 grid, one param, leads 6h and 12h; value = lead hour everywhere
+    values = np.broadcast_to(np.array([6, 12], dtype=np.float32), (1, 2, 2, 2))
+    cube = make_forecast_cube(["precipitation"], [27.0, 27.5], [89.5, 90.0], ["6h", "12h"],
+                              pd.Timestamp(2025, 9, 14), values)
+    cube['run_id'] = "20250914000000"
+    return cube
+
+
+def post(cube, monkeypatch, body):
+    monkeypatch.setattr(server, "get_cube", lambda: cube)
+    payload = json.dumps(body).encode()
+    status = []
+    response = server.application({'REQUEST_METHOD': 'POST', 'PATH_INFO': '/v1/interpolate',
+                                   'CONTENT_LENGTH': str(len(payload)), 'wsgi.input': io.BytesIO(payload)},
+                                  lambda s, headers: status.append(s))
+    return status[0], json.loads(b"".join(response))
+
+
+def test_interpolate_returns_series(cube, monkeypatch):
+    status, body = post(cube, monkeypatch, {'points': [{'lat': 27.25, 'lon': 89.75, 'id': "a"}]})
+    assert status == '200 OK'
+    assert body['points'][0]['series'] == {'precipitation': [6.0, 12.0]}
+
+
+@pytest.mark.parametrize("request_body", [
+    {'points': [{'lat': 27.25, 'lon': 89.75}], 'params': "precipitation"},
+    {'points': [{'lat': 27.25, 'lon': 89.75}], 'params': [["precipitation"]]},
+    {'points': [{'lat': 27.25, 'lon': 89.75}], 'params': [{}]},
+    {'points': [{'lat': 27.25, 'lon': 89.75}], 'params': ["snow"]},
+    {'points': [{'lat': "nan", 'lon': 89.75}]},
+    {'points': [{'lat': 27.25, 'lon': "inf"}]},
+    {'points': [{'lat': 27.25}]},
+    {'points': "27.25,89.75"},
+])
+def test_bad_requests_are_400(cube, monkeypatch, request_body):
+    status, body = post(cube, monkeypatch, request_body)
+    assert status == '400 Bad Request'
+    assert 'error' in body
+
+
+def test_valid_times_with_offset_are_converted_to_utc(cube, monkeypatch):
+    # 15:00 in Bhutan (+06:00) is 09:00 UTC, halfway between the 6h and 12h leads
+    status, body = post(cube, monkeypatch, {'points': [{'lat': 27.25, 'lon': 89.75}],
+                                            'valid_times': ["2025-09-14T15:00+06:00", "2025-09-14T09:00"]})
+    assert status == '200 OK'
+    assert body['valid_times'] == ["2025-09-14T09:00:00", "2025-09-14T09:00:00"]
+    assert body['points'][0]['series'] == {'precipitation': [9.0, 9.0]}
+
+
+@pytest.mark.parametrize("valid_times", [[1757840400000000000], "2025-09-14T09:00", [None], ["soon"], [""]])
+def test_bad_valid_times_are_400(cube, monkeypatch, valid_times):
+    status, body = post(cube, monkeypatch, {'points': [{'lat': 27.25, 'lon': 89.75}], 'valid_times': valid_times})
+    assert status == '400 Bad Request'
+    assert 'valid' in body['error']
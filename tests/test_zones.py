@@ -0,0 +1,95 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bhutan_weather.data import make_forecast_cube
+from bhutan_weather.zones import load_zone_weights, zonal_statistics
+
+
+def box(west, south, east, north):
+    return [[west, south], [east, south], [east, north], [west, north], [west, south]]
+
+
+# 0.5 degree grid at 27.0-28.0 N, 89.0-90.0 E: cell (1, 1) spans 27.25-27.75 N, 89.25-89.75 E
+ZONES = {
+    "centre cell": [box(89.25, 27.25, 89.75, 27.75)],
+    "west half of the centre cell": [box(89.25, 27.25, 89.5, 27.75)],
+    "centre cell with a hole": [box(89.25, 27.25, 89.75, 27.75), box(89.375, 27.375, 89.625, 27.625)],
+    "two cells along 27 N": [box(88.75, 26.75, 89.75, 27.25)],
+    "two cells along 89 E": [box(88.75, 26.75, 89.25, 27.75)],
+    "east of the grid": [box(90.5, 27.0, 91.0, 27.5)],
+}
+
+
+@pytest.fixture
+def boundaries(tmp_path):
+    path = tmp_path / "boundaries.geojson"
+    features = [{'type': "Feature", 'properties': {'name': name},
+                 'geometry': {'type': "Polygon", 'coordinates': rings}} for name, rings in ZONES.items()]
+    path.write_text(json.dumps({'type': "FeatureCollection", 'features': features}))
+    return str(path)
+
+
+@pytest.fixture
+def cube():
+    # Field 0 counts the cells 1..9 row by row; field 1 is the same with cell (0, 1) missing
+    counts = np.arange(1, 10, dtype=np.float32).reshape(3, 3, 1)
+    gappy = counts.copy()
+    gappy[0, 1] = np.nan
+    return make_forecast_cube(["counts", "gappy"], [27.0, 27.5, 28.0], [89.0, 89.5, 90.0], ["6h"],
+                              pd.Timestamp(2025, 9, 14), np.stack([counts, gappy]))
+
+
+def test_overlap_shares(cube, boundaries, tmp_path):
+    weights = load_zone_weights(cube, str(tmp_path / "store"), boundaries)
+    rows = {name: dict(zip(weights['indices'][start:end].tolist(), weights['fractions'][start:end].tolist()))
+            for name, start, end in zip(weights['names'], weights['indptr'][:-1], weights['indptr'][1:])}
+    assert rows == {
+        "centre cell": {4: 1.0},
+        "west half of the centre cell": {4: 0.5},
+        "centre cell with a hole": {4: 0.75},  # the hole is the middle half each way
+        "two cells along 27 N": {0: 1.0, 1: 1.0},
+        "two cells along 89 E": {0: 1.0, 3: 1.0},
+        "east of the grid": {},
+    }
+
+
+def test_zonal_mean_max_and_sum(cube, boundaries, tmp_path):
+    stats = zonal_statistics(cube, load_zone_weights(cube, str(tmp_path / "store"), boundaries))
+    table = {stat: {name: stats[stat][z, :, 0].tolist() for z, name in enumerate(stats['zones'])}
+             for stat in ("mean", "max", "sum")}
+
+    # Cells further north are narrower, so 4 weighs a little less than 1 in the mean along 89 E
+    north, south = math.cos(math.radians(27.5)), math.cos(math.radians(27.0))
+    mean_along_89 = (1 * south + 4 * north) / (south + north)
+
+    assert table['mean']["centre cell"] == [5, 5]
+    assert table['sum']["centre cell with a hole"] == [3.75, 3.75]
+    assert table['sum']["west half of the centre cell"] == [2.5, 2.5]
+    assert table['mean']["two cells along 27 N"] == [1.5, 1]  # the missing cell is skipped
+    assert table['max']["two cells along 27 N"] == [2, 1]
+    assert table['sum']["two cells along 27 N"] == [3, 1]
+    np.testing.assert_allclose(table['mean']["two cells along 89 E"], [mean_along_89] * 2, rtol=1e-6)
+    for stat in ("mean", "max", "sum"):
+        assert np.isnan(table[stat]["east of the grid"]).all()
+
+
+def test_weights_are_reused_from_the_store(cube, boundaries, tmp_path, monkeypatch):
+    first = load_zone_weights(cube, str(tmp_path / "store"), boundaries)
+    monkeypatch.setattr("bhutan_weather.zones._weights_cache.get", lambda key: None)
+    monkeypatch.setattr("bhutan_weather.zones.overlap_weights", lambda *a, **kw: pytest.fail("recomputed"))
+    again = load_zone_weights(cube, str(tmp_path / "store"), boundaries)
+    assert again['names'] == first['names']
+    np.testing.assert_array_equal(again['fractions'], first['fractions'])
+
+
+def test_unset_zones_path_disables_zones(cube, tmp_path):
+    assert load_zone_weights(cube, str(tmp_path / "store"), None) is None
+
+
+def test_missing_boundary_file_fails_loudly(cube, tmp_path):
+    with pytest.raises(FileNotFoundError, match="ZONES_PATH"):
+        load_zone_weights(cube, str(tmp_path / "store"), str(tmp_path / "missing.geojson"))